@@ -0,0 +1,111 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Micro-benchmark of the PyQt5 signal shims used by the engine against the
+plain PyQt5 widgets.
+
+Run it with any python that has PyQt5 installed, no Krita needed:
+
+    python dev/benchmark_qt_shims.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+import importlib.util
+
+from PyQt5 import QtCore, QtWidgets
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+def load_qt_shims():
+    shims_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "python",
+        "tk_krita",
+        "qt_shims.py",
+    )
+    spec = importlib.util.spec_from_file_location("sgtk_krita_qt_shims", shims_path)
+    qt_shims = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(qt_shims)
+    return qt_shims
+
+
+def benchmark(label, statement, setup, iterations, namespace):
+    seconds = min(
+        timeit.repeat(
+            statement, setup=setup, number=iterations, repeat=5, globals=dict(namespace)
+        )
+    )
+    print("%-45s %10.2f us" % (label, seconds / iterations * 1e6))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication(sys.argv)
+
+    qt_shims = load_qt_shims()
+    (QAction, _) = qt_shims.make_signal_shims(QtCore, QtWidgets)
+
+    # QAbstractButton cannot be instantiated, so the same shim is applied to
+    # a push button
+    class ShimPushButton(QtWidgets.QPushButton):
+        clicked_noargs = QtCore.pyqtSignal()
+        clicked = qt_shims.NoArgsSignalOverload(QtWidgets.QPushButton, "clicked")
+
+        def _relay_clicked(self, checked=False):
+            self.clicked_noargs.emit()
+
+    namespace = {
+        "PlainAction": QtWidgets.QAction,
+        "ShimAction": QAction,
+        "PlainButton": QtWidgets.QPushButton,
+        "ShimButton": ShimPushButton,
+        "slot": lambda *args: None,
+    }
+
+    def run(label, statement, setup="pass"):
+        benchmark(label, statement, setup, iterations, namespace)
+
+    print("%d iterations, time per iteration\n" % iterations)
+
+    run("construct QAction (plain)", "PlainAction(None)")
+    run("construct QAction (shim)", "ShimAction(None)")
+    run("construct QPushButton (plain)", "PlainButton()")
+    run("construct QPushButton (shim)", "ShimButton()")
+
+    setup = "a = PlainAction(None); a.triggered.connect(slot)"
+    run("emit triggered (plain)", "a.trigger()", setup)
+    setup = "a = ShimAction(None); a.triggered.connect(slot)"
+    run("emit triggered (shim)", "a.trigger()", setup)
+    setup = "a = ShimAction(None); a.triggered[()].connect(slot)"
+    run("emit triggered[()] (shim)", "a.trigger()", setup)
+
+    # note that the action is kept alive while its signal is used
+    run("construct and connect (plain)", "a = PlainAction(None); a.triggered.connect(slot)")
+    run("construct and connect (shim)", "a = ShimAction(None); a.triggered.connect(slot)")
+    run(
+        "construct and connect triggered[()] (shim)",
+        "a = ShimAction(None); a.triggered[()].connect(slot)",
+    )
+
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
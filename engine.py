@@ -16,8 +16,12 @@ import os
 import sys
 import time
 import inspect
+import functools
 import logging
+import threading
 import traceback
+import collections
+import importlib.util
 
 import tank
 from tank.log import LogManager
@@ -41,6 +45,13 @@ APPLICATION_NAME = "Krita"
 # when Krita software version is above the tested one.
 SHOW_COMP_DLG = "SGTK_COMPATIBILITY_DIALOG_SHOWN"
 
+# environment variable that starts the engine without any UI, ie. to run
+# the publish hooks from kritarunner in a render farm.
+HEADLESS_ENV = "SGTK_KRITA_HEADLESS"
+
+# unique identifier of the log console panel
+LOG_CONSOLE_PANEL_ID = "tk_krita_log_console"
+
 # this is the absolute minimum Krita version for the engine to work. Actually
 # the one the engine was developed originally under, so change it at your
 # own risk if needed.
@@ -55,12 +66,38 @@ if not hasattr(krita, "shotgun"):
 # where an engine may not be present.
 logger = LogManager.get_logger(__name__)
 
+# Give a standard format to the message:
+#     Shotgun <basename>: <message>
+# where "basename" is the leaf part of the logging record name,
+# for example "tk-multi-shotgunpanel" or "qt_importer".
+LOG_FORMATTER = logging.Formatter("Shotgun %(basename)s: %(message)s")
+DEBUG_LOG_FORMATTER = logging.Formatter("Debug: Shotgun %(basename)s: %(message)s")
+
+
+def _load_source(module_name, module_path):
+    """
+    Loads the python module at the given path, the way the deprecated
+    imp.load_source did.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def is_headless():
+    """
+    Returns True if Toolkit was started without any UI, see HEADLESS_ENV.
+    """
+    return os.environ.get(HEADLESS_ENV, "0") not in ("", "0")
+
 
 # logging functionality
 def show_error(msg):
     from PyQt5.QtWidgets import QMessageBox
 
-    batch_mode = krita.Krita.instance().batchmode()
+    batch_mode = is_headless() or krita.Krita.instance().batchmode()
     if not batch_mode:
         QMessageBox.critical(None, "Shotgun Error | %s engine" % APPLICATION_NAME, msg)
     else:
@@ -70,7 +107,7 @@ def show_error(msg):
 def show_warning(msg):
     from PyQt5.QtWidgets import QMessageBox
 
-    batch_mode = krita.Krita.instance().batchmode()
+    batch_mode = is_headless() or krita.Krita.instance().batchmode()
     if not batch_mode:
         QMessageBox.warning(None, "Shotgun Warning | %s engine" % APPLICATION_NAME, msg)
     else:
@@ -80,7 +117,7 @@ def show_warning(msg):
 def show_info(msg):
     from PyQt5.QtWidgets import QMessageBox
 
-    batch_mode = False
+    batch_mode = is_headless()
     if not batch_mode:
         QMessageBox.information(None, "Shotgun Info | %s engine" % APPLICATION_NAME, msg)
     else:
@@ -120,10 +157,73 @@ def display_debug(msg):
         print(message)
 
 
+def display_batch(messages):
+    """
+    Displays a batch of (display function, message) in one go. Consecutive
+    messages that use the same display function are displayed together.
+    """
+    fct = None
+    group = []
+    for (message_fct, msg) in messages:
+        if message_fct is not fct and group:
+            fct("\n".join(group))
+            group = []
+        fct = message_fct
+        group.append(msg)
+
+    if group:
+        fct("\n".join(group))
+
+
+def _timed(metric_name, help_text=""):
+    """
+    Decorator that records the time spent in a function in the given timer
+    of the metrics of the current engine.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics = getattr(tank.platform.current_engine(), "metrics", None)
+            if metrics is None:
+                return fn(*args, **kwargs)
+
+            with metrics.timer(metric_name, help_text):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _traced(name, category="engine"):
+    """
+    Decorator that records the calls to a function in the trace of the
+    session, when it is being recorded.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # see tk_krita.get_trace_recorder
+            trace_recorder = getattr(getattr(krita, "shotgun", None), "trace_recorder", None)
+            if trace_recorder is None or not trace_recorder.enabled:
+                return fn(*args, **kwargs)
+
+            with trace_recorder.span(name, category):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 # methods to support the state when the engine cannot start up
 # for example if a non-tank file is loaded in Krita we load the project
 # context if exists, so we give a chance to the user to at least
 # do the basics operations.
+@_traced("refresh_engine")
+@_timed("tk_krita_refresh_engine_seconds", "Time spent refreshing the engine.")
 def refresh_engine():
     """
     refresh the current engine
@@ -142,8 +242,6 @@ def refresh_engine():
         )
         return
 
-    _fix_tk_multi_pythonconsole(logger)
-
     active_doc_path = None
     active_doc = krita.Krita.instance().activeDocument()
     if active_doc:
@@ -151,57 +249,88 @@ def refresh_engine():
         active_doc_path = active_doc.fileName()
 
     if not active_doc_path:
+        # whatever we were resolving before is not relevant anymore
+        engine.context_resolver.cancel()
         logger.debug("File has not been saved yet, aborting the refresh of the engine.")
         return
 
     # make sure path is normalized
     active_doc_path = os.path.abspath(active_doc_path)
 
+    # the contexts cached for the other documents might expire while the
+    # artist works on this one
+    if engine.context_prewarmer:
+        engine.context_prewarmer.schedule()
+
     # we are going to try to figure out the context based on the
     # active document
     current_context = tank.platform.current_engine().context
 
-    ctx = current_context
+    # going back and forth between the same documents is very common, so
+    # avoid resolving the context for them again and again.
+    config_key = engine.context_cache_config_key()
+    cached = engine.context_cache.get(active_doc_path, config_key)
+    if cached:
+        # whatever we were resolving before is not relevant anymore
+        engine.context_resolver.cancel()
 
-    # this file could be in another project altogether, so create a new
-    # API instance.
-    try:
-        # and construct the new context for this path:
-        tk = tank.sgtk_from_path(active_doc_path)
-        logger.debug("Extracted sgtk instance: '%r' from path: '%r'", tk, active_doc_path)
+        tk, ctx = cached
+        logger.debug(
+            "Given the path: '%s' the following context was found in the cache: '%r'",
+            active_doc_path,
+            ctx,
+        )
+        logger.debug("Context cache statistics: %s", engine.context_cache.stats())
+        _change_context(engine, ctx)
+        return
+
+    # resolving the context can take a while with a slow filesystem or
+    # Shotgun site, so do it in a worker thread and only come back to the
+    # main thread to change the context.
+    engine.context_resolver.request(active_doc_path, current_context, _on_context_resolved)
+
+
+def _on_context_resolved(path, result, error):
+    """
+    Called in the main thread once the context of the active document has
+    been resolved by the worker thread.
+    """
+    engine = tank.platform.current_engine()
+    if not engine:
+        return
+
+    if error:
+        if not isinstance(error, tank.TankError):
+            logger.error("Could not resolve the context from path '%s': %s", path, error)
+            return
 
-    except tank.TankError:
         # could not detect context from path, will use the project context
         # for menus if it exists
         message = (
             "Shotgun %s Engine could not detect the context\n"
             "from the active document. Shotgun menus will be  \n"
             "stay in the current context '%s' "
-            "\n" % (APPLICATION_NAME, ctx)
+            "\n" % (APPLICATION_NAME, engine.context)
         )
         display_warning(message)
         return
 
-    ctx = tk.context_from_path(active_doc_path, current_context)
-    logger.debug(
-        "Given the path: '%s' the following context was extracted: '%r'", active_doc_path, ctx
-    )
+    tk, ctx = result
+    engine.context_cache.set(path, engine.context_cache_config_key(), tk, ctx)
+    logger.debug("Context cache statistics: %s", engine.context_cache.stats())
+
+    _change_context(engine, ctx)
 
-    # default to project context in worse case scenario
-    if not ctx:
-        project_name = engine.context.project.get("name")
-        ctx = tk.context_from_entity_dictionary(engine.context.project)
-        logger.debug(
-            (
-                "Could not extract a context from the current active project "
-                "path, so we revert to the current project '%r' context: '%r'"
-            ),
-            project_name,
-            ctx,
-        )
 
+@_traced("change_context")
+@_timed("tk_krita_context_switch_seconds", "Time spent changing the engine context.")
+def _change_context(engine, ctx):
+    """
+    Changes the context of the engine, rebuilding the menu, if the context is
+    different than the current one.
+    """
     # Only change if the context is different
-    if ctx != current_context:
+    if ctx != engine.context:
         try:
             engine.change_context(ctx)
         except tank.TankError:
@@ -214,58 +343,88 @@ def refresh_engine():
             engine.create_shotgun_menu(disabled=True)
 
 
-# TBR: DGH290420
-# This is an interesting one. It is the only way I found I could fix the
-# python console. Other ideas are welcomed. I could have gone the deeper
-# route introspecting engine.apps but this ultimately felt simpler.
-# the main issue is that PyQt5 behaves differently when returning from a
-# keyPressEvent. While in PySide(2) the accepted behaviour is to return True
-# or False to indicate that we want to propagate the event, in PyQt5 seems
-# that a simple return indicates no propagation, whereas if we want to propagate
-# the event we should simply pass it on to our parent class. I could be wrong
-# in this as a general PyQt5 rule, but that is what I experienced.
+@_traced("resolve_context", "context")
+def _resolve_context(path, current_context):
+    """
+    Runs in the context resolver worker thread. Returns the toolkit instance
+    and context for the given path, looking first at the contexts resolved in
+    previous sessions.
+    """
+    engine = tank.platform.current_engine()
+    context_store = engine.context_store if engine else None
 
+    if context_store:
+        ctx = context_store.get_context(path)
+        if ctx:
+            logger.debug(
+                "Given the path: '%s' the following context was found in the store: '%r'",
+                path,
+                ctx,
+            )
+            return ctx.sgtk, ctx
 
-def _fix_tk_multi_pythonconsole(logger):
-    PythonTabWidget = None
-    for module_name in sys.modules.keys():
-        if "app.console" in module_name:
-            module = sys.modules[module_name]
-            if hasattr(module, "PythonTabWidget"):
-                PythonTabWidget = module.PythonTabWidget
+    tk, ctx = _context_from_path(path, current_context)
 
-    if PythonTabWidget:
-        try:
+    if context_store:
+        context_store.set_context(path, ctx)
 
-            def keyPressEvent(self, event):
-                """
-                Adds support for tab creation and navigation via hotkeys.
-                """
+    return tk, ctx
 
-                if bool(module.QtCore.Qt.ControlModifier & event.modifiers()):
-                    # Ctrl+T to add a new tab
-                    if event.key() == module.QtCore.Qt.Key_T:
-                        self.add_tab()
-                        return
 
-                    # Ctrl+Shift+[ or Ctrl+Shift+] to navigate tabs
-                    if bool(module.QtCore.Qt.ShiftModifier & event.modifiers()):
-                        if event.key() in [module.QtCore.Qt.Key_BraceLeft]:
-                            self.goto_tab(-1)
-                        elif event.key() in [module.QtCore.Qt.Key_BraceRight]:
-                            self.goto_tab(1)
+def _context_from_path(path, current_context):
+    """
+    Returns the toolkit instance and context for the given path.
+    Raises a TankError if the path does not belong to any toolkit project.
+    """
+    # this file could be in another project altogether, so create a new
+    # API instance.
+    tk = tank.sgtk_from_path(path)
+    logger.debug("Extracted sgtk instance: '%r' from path: '%r'", tk, path)
 
-                return super(PythonTabWidget, self).keyPressEvent(event)
+    # and construct the new context for this path:
+    ctx = tk.context_from_path(path, current_context)
+    logger.debug("Given the path: '%s' the following context was extracted: '%r'", path, ctx)
 
-            PythonTabWidget.keyPressEvent = keyPressEvent
-            logger.debug(
-                "Applied tk-krita fix to tk-multi-python console. Class:%s" % PythonTabWidget
-            )
-        except Exception:
-            logger.warning(
-                "Could not apply tk-krita fix to multi python console. Class: %s"
-                % PythonTabWidget
-            )
+    # default to project context in worse case scenario
+    if not ctx:
+        project_name = current_context.project.get("name")
+        ctx = tk.context_from_entity_dictionary(current_context.project)
+        logger.debug(
+            (
+                "Could not extract a context from the current active project "
+                "path, so we revert to the current project '%r' context: '%r'"
+            ),
+            project_name,
+            ctx,
+        )
+
+    return tk, ctx
+
+
+def get_active_document_name():
+    """
+    Returns the file name of the active document, if any.
+    """
+    active_doc = krita.Krita.instance().activeDocument()
+    if active_doc:
+        return active_doc.fileName() or active_doc.name()
+
+
+def _startup_span(name):
+    """
+    Decorator that records the time spent in an engine method as one of the
+    startup phases of the engine.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            with self.startup_recorder.span(name):
+                return fn(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
 class PyQt5Patcher(PySide2Patcher):
@@ -285,13 +444,15 @@ class PyQt5Patcher(PySide2Patcher):
     _TOOLKIT_COMPATIBLE = "__toolkit_compatible"
 
     @classmethod
-    def patch(cls, QtCore, QtGui, QtWidgets, PyQt5):
+    def patch(cls, QtCore, QtGui, QtWidgets, PyQt5, widgets=True):
         """
         Patches QtCore, QtGui and QtWidgets
         :param QtCore: The QtCore module.
         :param QtGui: The QtGui module.
         :param QtWidgets: The QtWidgets module.
         :param PyQt5: The PyQt5 module.
+        :param widgets: If False, only the PySide API is added, leaving the
+                        widgets untouched, ie. when running headless.
         """
 
         # Add this version info otherwise it breaks since tk_core v0.19.9
@@ -309,6 +470,16 @@ class PyQt5Patcher(PySide2Patcher):
             """
             return arg.replace("()", "")
 
+        # hot patch the library to make it work with pyside code
+        QtCore.SIGNAL = SIGNAL
+        QtCore.Signal = QtCore.pyqtSignal
+        QtCore.Slot = QtCore.pyqtSlot
+        QtCore.Property = QtCore.pyqtProperty
+        QtCore.__version__ = QtCore.PYQT_VERSION_STR
+
+        if not widgets:
+            return QtCore, QtGui
+
         class QLabel(QtGui.QLabel):
             """
             Unfortunately in some cases sgtk sets the pixmap as None to remove
@@ -332,65 +503,14 @@ class PyQt5Patcher(PySide2Patcher):
                 screen = QtGui.QApplication.primaryScreen()
                 return screen.grabWindow(window, x=x, y=y, width=width, height=height)
 
-        class QAction(QtGui.QAction):
-            """
-            From the docs:
-            https://www.riverbankcomputing.com/static/Docs/PyQt5/incompatibilities.html#qt-signals-with-default-arguments
-
-            Explanation:
-            https://stackoverflow.com/questions/44371451/python-pyqt-qt-qmenu-qaction-syntax
-
-            A lot of cases in tk apps where QAction triggered signal is
-            connected with `triggered[()].connect` which in PyQt5 is a problem
-            because triggered is an overloaded signal with two signatures,
-            triggered = QtCore.pyqtSignal(bool)
-            triggered = QtCore.pyqtSignal()
-            If you wanted to use the second overload, you had to use the
-            `triggered[()]` approach to avoid the extra boolean attribute to
-            trip you in the callback function.
-            The issue is that in PyQt5.3+ this has changed and is no longer
-            allowed as only the first overloaded function is implemented and
-            always called with the extra boolean value.
-            To avoid this normally we would have to decorate our slots with the
-            decorator:
-            @QtCore.pyqtSlot
-            but changing the tk apps is out of the scope of this engine.
-            To fix this we implement a new signal and rewire the connections so
-            it is available once more for tk apps to be happy.
-            """
-
-            triggered_ = QtCore.pyqtSignal([bool], [])
-
-            def __init__(self, *args, **kwargs):
-                super(QAction, self).__init__(*args, **kwargs)
-                super(QAction, self).triggered.connect(lambda checked: self.triggered_[()])
-                super(QAction, self).triggered.connect(self.triggered_[bool])
-                self.triggered = self.triggered_
-                self.triggered.connect(self._onTriggered)
-
-            def _onTriggered(self, checked=False):
-                self.triggered_[()].emit()
-
-        class QAbstractButton(QtGui.QAbstractButton):
-            """ See QAction above for explanation """
-
-            clicked_ = QtCore.pyqtSignal([bool], [])
-            triggered_ = QtCore.pyqtSignal([bool], [])
-
-            def __init__(self, *args, **kwargs):
-                super(QAbstractButton, self).__init__(*args, **kwargs)
-                super(QAbstractButton, self).clicked.connect(lambda checked: self.clicked_[()])
-                super(QAbstractButton, self).clicked.connect(self.clicked_[bool])
-                self.clicked = self.clicked_
-                self.clicked.connect(self._onClicked)
-
-                super(QAction, self).triggered.connect(lambda checked: self.triggered_[()])
-                super(QAction, self).triggered.connect(self.triggered_[bool])
-                self.triggered = self.triggered_
-                self.triggered.connect(self._onTriggered)
-
-            def _onClicked(self, checked=False):
-                self.clicked_[()].emit()
+        # QAction and QAbstractButton with the triggered[()] and clicked[()]
+        # overloads tk apps expect. Note that our python modules cannot be
+        # imported at this point, so we load the module by its path.
+        qt_shims = _load_source(
+            "sgtk_krita_qt_shims",
+            os.path.join(os.path.dirname(__file__), "python", "tk_krita", "qt_shims.py"),
+        )
+        QAction, QAbstractButton = qt_shims.make_signal_shims(QtCore, QtGui)
 
         class QObject(QtCore.QObject):
             """
@@ -468,13 +588,6 @@ class PyQt5Patcher(PySide2Patcher):
                     self += 1
                     value = self.value()
 
-        # hot patch the library to make it work with pyside code
-        QtCore.SIGNAL = SIGNAL
-        QtCore.Signal = QtCore.pyqtSignal
-        QtCore.Slot = QtCore.pyqtSlot
-        QtCore.Property = QtCore.pyqtProperty
-        QtCore.__version__ = QtCore.PYQT_VERSION_STR
-
         # widgets and class fixes
         QtGui.QLabel = QLabel
         QtGui.QPixmap = QPixmap
@@ -505,8 +618,125 @@ class KritaEngine(Engine):
         # variables.
         self._dock_widgets = []
 
+        # see the window_registry property
+        self._window_registry = None
+
+        # see the headless property
+        self._headless = is_headless()
+
+        # see _refresh_bootstrap_snapshot
+        self._bootstrap_resolver = None
+
+        # see pre_app_init
+        self.memory_profiler = None
+        self.trace_recorder = None
+
+        # performance metrics of the session, see pre_app_init
+        self.metrics = None
+        self._metrics_timer = None
+
+        # runs the run_at_startup commands once Krita is idle
+        self._startup_scheduler = None
+
+        # app instance name -> (app, command cache key) of the apps whose
+        # initialization is deferred, see _start_lazy_apps
+        self._lazy_apps = {}
+
+        # log messages waiting to be displayed in the main thread
+        self._log_queue = collections.deque()
+        self._log_lock = threading.Lock()
+        self._log_flush_pending = False
+
+        # log records kept in memory for the log console. Our python modules
+        # cannot be imported yet, so records logged until pre_app_init are
+        # kept aside.
+        self.log_buffer = None
+        self._early_log_records = []
+
+        # optional machine readable log, see pre_app_init
+        self.json_log_sink = None
+        self._log_record_to_dict = None
+        self._json_log_context = None
+        self._json_log_document = None
+        self._json_log_document_events = ()
+
+        # the startup phases are timed with a recorder shared with the Krita
+        # extension and the startup code through the krita module. Note that
+        # our python modules cannot be imported until Qt is set up, see
+        # _define_qt_base, so if the startup code did not create the recorder
+        # we load the timing module by its path, it does not depend on Qt.
+        self._startup_recorder = getattr(krita.shotgun, "startup_recorder", None)
+        if self._startup_recorder is None:
+            timing = _load_source(
+                "sgtk_krita_timing",
+                os.path.join(os.path.dirname(__file__), "python", "tk_krita", "timing.py"),
+            )
+            self._startup_recorder = timing.get_startup_recorder()
+        self._menu_wait_span = None
+        self._menu_wait_connected = False
+        self._startup_menu_created = False
+        self._startup_init_done = False
+        init_span = self._startup_recorder.begin("KritaEngine.__init__")
+
         tank.platform.Engine.__init__(self, *args, **kwargs)
 
+        self._startup_recorder.end(init_span)
+
+        self._startup_init_done = True
+        self._finish_startup_timing()
+
+    @property
+    def startup_recorder(self):
+        """
+        Returns the recorder used to time the startup phases of the engine.
+        """
+        return self._startup_recorder
+
+    def _finish_startup_timing(self):
+        """
+        Writes the startup timing report once the engine is initialized and
+        the menu has been created.
+        """
+        if not self._startup_init_done:
+            return
+
+        if self.has_ui and not self._startup_menu_created:
+            return
+
+        if self.startup_recorder.closed:
+            return
+
+        if self.has_ui:
+            # let the extension and startup code finish their spans
+            from sgtk.platform.qt import QtCore
+
+            QtCore.QTimer.singleShot(0, self._write_startup_report)
+        else:
+            self._write_startup_report()
+
+    def _write_startup_report(self):
+        """
+        Writes the startup timing report to the toolkit log folder.
+        """
+        recorder = self.startup_recorder
+        if recorder.closed:
+            return
+
+        try:
+            report_path = recorder.write_report(
+                LogManager().log_folder,
+                engine=self.name,
+                engine_version=self.version,
+                host=self.host_info,
+                apps=dict((name, app.version) for (name, app) in self.apps.items()),
+            )
+        except Exception as e:
+            self.logger.debug("Could not write the startup timing report: %s", e)
+            return
+
+        self.logger.debug("Startup timing report written to: %s", report_path)
+
+    @_startup_span("KritaEngine._define_qt_base")
     def _define_qt_base(self):
         """
         This will be called at initialization time and will allow
@@ -518,7 +748,9 @@ class KritaEngine(Engine):
         * dialog_base - base class for to use for Toolkit's dialog factory
         :returns: dict
         """
-        if not self.has_ui:
+        # headless sessions still need Qt for the modules of the apps and
+        # hooks that define Qt classes, but none of the widget fixes
+        if not self.has_ui and not self.headless:
             return {}
 
         # Proxy class used when QT does not exist on the system.
@@ -544,7 +776,10 @@ class KritaEngine(Engine):
             self.log_debug(traceback.format_exc())
             return base
 
-        QtCore, QtGui = PyQt5Patcher.patch(QtCore, QtGui, QtWidgets, PyQt5)
+        with self.startup_recorder.span("PyQt5Patcher.patch"):
+            QtCore, QtGui = PyQt5Patcher.patch(
+                QtCore, QtGui, QtWidgets, PyQt5, widgets=not self.headless
+            )
 
         base["qt_core"] = QtCore
         base["qt_gui"] = QtGui
@@ -597,16 +832,31 @@ class KritaEngine(Engine):
             pass
         return host_info
 
-    def _on_active_doc_timer(self):
+    @property
+    def window_registry(self):
         """
-        Refresh the engine if the current document has changed since the last
-        time we checked.
+        Returns the registry of the Krita main windows, used to find the
+        main window, its menu bar and docks without going through all the
+        widgets of the application.
         """
-        active_doc = krita.Krita.instance().activeDocument()
-        if self.active_doc != active_doc:
-            self.active_doc = active_doc
-            refresh_engine()
+        if self._window_registry is None:
+            tk_krita = self.import_module("tk_krita")
+            self._window_registry = tk_krita.WindowRegistry(self.document_events)
+            if self.has_ui:
+                self._window_registry.start()
 
+        return self._window_registry
+
+    def context_cache_config_key(self):
+        """
+        Returns the key that identifies the current pipeline configuration in
+        the context cache.
+        """
+        tk_krita = self.import_module("tk_krita")
+        return tk_krita.get_config_key(self.sgtk)
+
+    @_startup_span("KritaEngine.pre_app_init")
+    @_traced("KritaEngine.pre_app_init")
     def pre_app_init(self):
         """
         Runs after the engine is set up but before any apps have been
@@ -621,16 +871,593 @@ class KritaEngine(Engine):
         QtCore.QTextCodec.setCodecForCStrings(utf8)
         self.logger.debug("set utf-8 codec for widget text")
 
-        # We use a timer instead of the notifier API as the API does not
-        # inform us when the user changes views, only when they are created
-        # cloned, or closed.
+        # The notifier API does not inform us when the user changes views,
+        # only when they are created, cloned, or closed, so the tracker also
+        # listens to the active view changes of every window, and waits for
+        # the events to settle down before refreshing the engine.
         # Since the restart of the engine every time a view is chosen is an
-        # expensive operation, we will offer this functionality as am option
+        # expensive operation, we will offer this functionality as an option
         # inside the context menu.
-        self.active_doc = None
-        self.active_doc_timer = QtCore.QTimer()
-        self.active_doc_timer.timeout.connect(self._on_active_doc_timer)
+        tk_krita = self.import_module("tk_krita")
+
+        # counters and timers of the session, that hooks can use too
+        self.metrics = tk_krita.MetricsRegistry(labels={"pid": os.getpid()})
+
+        # trace of the engine and hooks activity, kept across restarts of the
+        # engine and toggled from the context menu
+        self.trace_recorder = tk_krita.get_trace_recorder(
+            max_events=self.get_setting("trace_buffer_size", 100000),
+            enabled=self.get_setting("trace_enabled", False),
+        )
+
+        # the only place listening to the Krita document signals, the engine
+        # caches and the hooks subscribe to the events they care about.
+        self.document_events = tk_krita.DocumentEventBus(self.logger)
+
+        # worst case memory of the opened documents, so the hooks can warn
+        # before an operation goes over the budget
+        self.memory_monitor = tk_krita.DocumentMemoryMonitor(
+            self.document_events,
+            self.metrics,
+            budget=self.get_setting("memory_budget_mb", 0) * 1024 * 1024,
+        )
+
+        self.active_doc_tracker = tk_krita.ActiveDocumentTracker(
+            refresh_engine, self.document_events
+        )
+
+        # cache of the contexts resolved for the documents paths, so going back
+        # to a document we already visited does not need to resolve it again.
+        self.context_cache = tk_krita.ContextCache(
+            max_size=self.get_setting("context_cache_size", 32),
+            ttl=self.get_setting("context_cache_ttl", 600),
+        )
+
+        # resolves the context of the documents without blocking Krita
+        self.context_resolver = tk_krita.ContextResolver(
+            _resolve_context, self.async_execute_in_main_thread, self.logger
+        )
+
+        # resolves the contexts of all the opened documents while Krita is
+        # idle, so switching between them finds their context in the cache.
+        # It has its own resolver, a request to one drops the previous one.
+        self.context_prewarmer = None
+        if self.get_setting("context_prewarm", False):
+            self.context_prewarmer = tk_krita.ContextPrewarmer(
+                tk_krita.ContextResolver(
+                    _resolve_context, self.async_execute_in_main_thread, self.logger
+                ),
+                self.document_events,
+                lambda path: self.context_cache.contains(
+                    path, self.context_cache_config_key()
+                ),
+                self._on_context_prewarmed,
+                lambda: self.context,
+            )
+
+        # contexts resolved in previous sessions, so reopening yesterday's
+        # work does not need to resolve them again.
+        self.context_store = None
+        if self.get_setting("context_cache_persistent", True):
+            self.context_store = tk_krita.ContextStore(
+                max_age=self.get_setting("context_cache_persistent_max_age", 604800)
+            )
+
+        self.document_events.subscribe(tk_krita.DOCUMENT_SAVED, self._on_document_saved)
+        self.document_events.subscribe(tk_krita.DOCUMENT_CLOSED, self._on_document_closed)
+        for event in tk_krita.DOCUMENT_EVENTS:
+            self.document_events.subscribe(
+                event, functools.partial(self._trace_document_event, event)
+            )
+
+        # lets the docked panels know when they are hidden, and tears them
+        # down if they stay hidden for too long
+        self.panel_lifecycle = tk_krita.PanelLifecycleManager(
+            suspend_timeout=self.get_setting("panel_suspend_timeout", 0), logger=self.logger
+        )
+
+        # runs long operations in slices so Krita keeps repainting, see
+        # tk_krita.task_scheduler
+        self.task_scheduler = tk_krita.TaskScheduler()
+
+        # reports the Toolkit commands blocking Krita for too long
+        self.stall_watchdog = None
+        stall_threshold = self.get_setting("stall_watchdog_threshold", 0)
+        if self.has_ui and stall_threshold > 0:
+            self.stall_watchdog = tk_krita.StallWatchdog(
+                stall_threshold, self.logger, document_fn=get_active_document_name
+            )
+            self.stall_watchdog.start()
+
+        # reports the memory allocated by the menu commands and the publish
+        # phases, see tk_krita.memory_profiler
+        if self.get_setting("memory_profiling", False) or os.environ.get(
+            "TK_KRITA_MEMORY_PROFILING"
+        ):
+            self.memory_profiler = tk_krita.MemoryProfiler(
+                LogManager().log_folder, self.logger
+            )
+            self.memory_profiler.start()
+            self.logger.debug(
+                "Memory profiling enabled, report: %s", self.memory_profiler.report_path
+            )
+
+        # log records kept in memory, shown in the log console panel
+        self.log_buffer = tk_krita.LogRingBuffer(self.get_setting("log_console_size", 100000))
+
+        # json lines log, written by its own thread
+        if self.get_setting("json_log_enabled", False):
+            # importing our modules is not thread safe, and records come
+            # from any thread
+            self._log_record_to_dict = tk_krita.log_record_to_dict
+            self.json_log_sink = tk_krita.JsonLogSink(
+                os.path.join(
+                    LogManager().log_folder, "%s_%s.jsonl" % (ENGINE_NAME, os.getpid())
+                ),
+                max_bytes=self.get_setting("json_log_max_bytes", 10485760),
+                backup_count=self.get_setting("json_log_backup_count", 5),
+            )
+            self.json_log_sink.start()
+
+            # the active document reported in the json log is kept up to date
+            # by the document events, the Krita API cannot be used from the
+            # threads logging.
+            self._json_log_document_events = (
+                tk_krita.DOCUMENT_CREATED,
+                tk_krita.DOCUMENT_SAVED,
+                tk_krita.DOCUMENT_CLOSED,
+                tk_krita.VIEW_CLOSED,
+                tk_krita.ACTIVE_VIEW_CHANGED,
+            )
+            for event in self._json_log_document_events:
+                self.document_events.subscribe(event, self._update_json_log_document)
+
+        for (record, msg) in self._early_log_records:
+            self.log_buffer.append_record(record, msg)
+            self._emit_json_log_record(record)
+        self._early_log_records = []
+
+        # patches the tk apps modules that need it to work with PyQt5 as
+        # they are imported
+        self.compat_patches = tk_krita.PatchRegistry()
+        if not self.headless:
+            self.compat_patches.install()
+
+        # time the initialization of every app, until post_app_init
+        self._start_apps_timing()
+
+        # defer the initialization of the apps until they are used
+        self._start_lazy_apps()
 
+    def register_command(self, name, callback, properties=None):
+        """
+        Registers a command, see the engine base class.
+        When the stall watchdog is enabled, the command is run as a watched
+        operation.
+        """
+        if getattr(self, "stall_watchdog", None) is not None:
+            callback = self._watched_callback(name, callback)
+        return super(KritaEngine, self).register_command(name, callback, properties)
+
+    def _watched_callback(self, name, callback):
+        """
+        Returns a callback that runs the given one as a stall watchdog
+        operation.
+        """
+
+        @functools.wraps(callback)
+        def watched_callback(*args, **kwargs):
+            with self.stall_watchdog.operation(name):
+                return callback(*args, **kwargs)
+
+        return watched_callback
+
+    @property
+    def metrics_textfile_path(self):
+        """
+        Returns the path of the file the metrics are dumped to, or None if
+        they are not dumped.
+        """
+        folder = self.get_setting("metrics_textfile_folder", "")
+        if not folder:
+            return None
+
+        folder = os.path.expanduser(os.path.expandvars(folder))
+        return os.path.join(folder, "%s_%s.prom" % (ENGINE_NAME, os.getpid()))
+
+    def dump_metrics(self):
+        """
+        Writes the metrics in the Prometheus textfile format.
+        """
+        metrics_path = self.metrics_textfile_path
+        if not metrics_path:
+            return
+
+        # the documents memory is only estimated when needed
+        self.memory_monitor.update_metrics()
+
+        try:
+            self.metrics.write_prometheus(metrics_path)
+        except (IOError, OSError) as e:
+            self.logger.debug("Could not write the metrics to %s: %s", metrics_path, e)
+
+    def _refresh_bootstrap_snapshot(self, bootstrap):
+        """
+        Takes a new snapshot of the context the engine starts in for this
+        launch of Krita, see startup/init.py. The context of the file to open
+        is resolved again in the background, and if the engine started from
+        a snapshot that is out of date, the context is changed.
+
+        :param bootstrap: Dictionary with the launch key, the file to open
+                          and whether the engine started from a snapshot.
+        """
+        tk_krita = self.import_module("tk_krita")
+        snapshot = tk_krita.BootstrapSnapshot(bootstrap["key"])
+        fingerprint = tk_krita.get_config_fingerprint(self.sgtk)
+        file_to_open = bootstrap["file_to_open"]
+        startup_context = self.context
+
+        if not file_to_open:
+            # the engine started in the context it was launched with
+            snapshot.save(self.context, fingerprint)
+            return
+
+        def on_resolved(path, result, error):
+            if error is not None:
+                self.logger.debug("Could not resolve the context of '%s': %s", path, error)
+                snapshot.invalidate()
+                return
+
+            tk, ctx = result
+            self.context_cache.set(path, self.context_cache_config_key(), tk, ctx)
+            if self.context_store:
+                self.context_store.set_context(path, ctx)
+
+            # the next launch starts with the toolkit instance of this one
+            if tk_krita.get_config_fingerprint(tk) == fingerprint:
+                snapshot.save(ctx, fingerprint)
+            else:
+                snapshot.invalidate()
+
+            if not bootstrap["from_snapshot"] or ctx == startup_context:
+                return
+
+            self.logger.debug(
+                "The context of '%s' changed since the snapshot was taken: %r", path, ctx
+            )
+
+            # the artist might have moved on to another document, or the
+            # engine to another context, while the context was resolved
+            active_doc = krita.Krita.instance().activeDocument()
+            active_doc_path = active_doc.fileName() if active_doc else None
+            if (
+                active_doc_path
+                and os.path.normcase(os.path.abspath(active_doc_path))
+                == os.path.normcase(os.path.abspath(file_to_open))
+                and self.context == startup_context
+            ):
+                _change_context(self, ctx)
+
+        # skip the stored contexts, the point is to check them
+        self._bootstrap_resolver = tk_krita.ContextResolver(
+            _context_from_path, self.async_execute_in_main_thread, self.logger
+        )
+        self._bootstrap_resolver.request(file_to_open, self.context, on_resolved)
+
+    def _on_context_prewarmed(self, path, result):
+        """
+        Caches the context resolved ahead of time for an opened document.
+        """
+        tk, ctx = result
+        self.context_cache.set(path, self.context_cache_config_key(), tk, ctx)
+        self.logger.debug("Prewarmed context for path '%s': %r", path, ctx)
+
+    def _on_document_saved(self, path):
+        """
+        Saving the active document under a new name can move it to another
+        context, which the active document tracker does not notice since the
+        active document is still the same.
+        """
+        if not self.active_document_context_switch:
+            return
+
+        active_doc = krita.Krita.instance().activeDocument()
+        active_doc_path = active_doc.fileName() if active_doc else None
+        if active_doc_path and os.path.abspath(active_doc_path) == path:
+            refresh_engine()
+
+    def _on_document_closed(self, path):
+        """
+        Nobody is going to switch to a closed document, leave room in the
+        cache for the opened ones. The context store still remembers it in
+        case it is reopened.
+        """
+        if path:
+            self.context_cache.invalidate(path)
+
+    def _update_json_log_document(self, *_):
+        """
+        Remembers the active document for the json log records.
+        """
+        active_doc = krita.Krita.instance().activeDocument()
+        self._json_log_document = active_doc.fileName() if active_doc else None
+
+    def _trace_document_event(self, event, *args):
+        """
+        Marks the document events in the trace, next to the work they cause.
+        """
+        if args and isinstance(args[0], str):
+            self.trace_recorder.instant(event, "document", path=args[0])
+        else:
+            self.trace_recorder.instant(event, "document")
+
+    def _start_apps_timing(self):
+        """
+        Records the time spent loading and initializing every app as startup
+        spans.
+        The engine base class does not give us a chance to do this, so we
+        temporarily wrap the function it uses to create the apps, until
+        _stop_apps_timing is called.
+        """
+        from tank.platform import application
+
+        self._apps_span = None
+        self._original_get_application = None
+
+        recorder = self.startup_recorder
+        if recorder.closed or not hasattr(application, "get_application"):
+            return
+
+        original_get_application = application.get_application
+
+        def get_application(*args, **kwargs):
+            start = time.perf_counter()
+            app = original_get_application(*args, **kwargs)
+            recorder.record("load app %s" % app.instance_name, start, time.perf_counter())
+
+            init_app = app.init_app
+
+            def timed_init_app():
+                try:
+                    with recorder.span("init app %s" % app.instance_name):
+                        return init_app()
+                finally:
+                    # back to the original method of the app
+                    del app.init_app
+
+            app.init_app = timed_init_app
+            return app
+
+        self._apps_span = recorder.begin("KritaEngine apps initialization")
+        self._original_get_application = original_get_application
+        application.get_application = get_application
+
+    def _stop_apps_timing(self):
+        """
+        Stops timing the apps, see _start_apps_timing.
+        """
+        from tank.platform import application
+
+        if self._original_get_application:
+            application.get_application = self._original_get_application
+            self._original_get_application = None
+
+        self.startup_recorder.end(self._apps_span)
+
+    def _start_lazy_apps(self):
+        """
+        When the lazy_app_loading setting is enabled, apps are not
+        initialized during the engine startup. Instead, the commands they
+        registered the last time they were initialized are registered as
+        stubs that initialize the app the first time one of them is run.
+
+        Apps listed in the run_at_startup setting, apps that do not register
+        any commands and apps we do not know the commands of yet are
+        initialized as usual, and their commands cached for the next time.
+
+        As with the timing of the apps, the engine base class does not give
+        us a chance to do this, so we temporarily wrap the function it uses
+        to create the apps, until _stop_lazy_apps is called. The apps are
+        reloaded when the context changes, so this is done again in
+        pre_context_change. Apps that allow context changes are kept instead,
+        so the ones still deferred stay in _lazy_apps.
+        """
+        from tank.platform import application
+
+        # app instance name -> command cache key
+        self._eager_apps = {}
+        self._original_lazy_get_application = None
+        self.command_cache = None
+
+        # headless sessions run the apps unattended, they need them all
+        if self.headless or not self.get_setting("lazy_app_loading", False):
+            return
+
+        tk_krita = self.import_module("tk_krita")
+        self.command_cache = tk_krita.CommandCache(tk_krita.get_config_fingerprint(self.sgtk))
+
+        original_get_application = application.get_application
+
+        def get_application(*args, **kwargs):
+            app = original_get_application(*args, **kwargs)
+
+            # when the context changes, the new environment is only known
+            # once the apps are being loaded
+            run_at_startup = set(
+                app_setting_dict["app_instance"]
+                for app_setting_dict in self.get_setting("run_at_startup", [])
+            )
+            key = tk_krita.get_app_key(app, self.environment["name"], self.context)
+            commands = self.command_cache.get(key)
+
+            if app.instance_name in run_at_startup or not commands:
+                self._eager_apps[app.instance_name] = key
+                return app
+
+            # the engine initializes the app with the stubs instead, and
+            # must not run any other app method until it is really
+            # initialized, see _load_lazy_app
+            app.init_app = functools.partial(self._register_command_stubs, app, commands)
+            app.post_engine_init = lambda: None
+            app.destroy_app = lambda: None
+            self._lazy_apps[app.instance_name] = (app, key)
+            return app
+
+        self._original_lazy_get_application = original_get_application
+        application.get_application = get_application
+
+    def _stop_lazy_apps(self):
+        """
+        Stops deferring the initialization of the apps, see _start_lazy_apps,
+        and caches the commands of the apps that were initialized.
+        """
+        from tank.platform import application
+
+        if not self._original_lazy_get_application:
+            return
+
+        application.get_application = self._original_lazy_get_application
+        self._original_lazy_get_application = None
+
+        for (app_instance_name, key) in self._eager_apps.items():
+            app = self.apps.get(app_instance_name)
+            if app:
+                self.command_cache.set(key, self._get_app_commands(app))
+        self.command_cache.save()
+
+        # forget about the deferred apps destroyed by a context change
+        self._lazy_apps = dict(
+            (app_instance_name, (app, key))
+            for (app_instance_name, (app, key)) in self._lazy_apps.items()
+            if self.apps.get(app_instance_name) is app
+        )
+
+        if self._lazy_apps:
+            self.logger.debug(
+                "Deferred the initialization of apps: %s", ", ".join(sorted(self._lazy_apps))
+            )
+
+    def _get_app_commands(self, app):
+        """
+        Returns the (name, properties) of the commands registered by an app.
+        Names are returned without the prefix the engine adds when several
+        apps register commands with the same name.
+        """
+        app_commands = []
+        for (name, command) in self.commands.items():
+            properties = command["properties"]
+            if properties.get("app") is not app:
+                continue
+
+            prefix = properties.get("prefix")
+            if prefix and name.startswith(prefix + ":"):
+                name = name[len(prefix) + 1 :]
+            app_commands.append((name, properties))
+
+        return app_commands
+
+    def _register_command_stubs(self, app, commands):
+        """
+        Registers the cached commands of an app that has not been initialized
+        yet. Running any of them initializes the app and runs the real
+        command.
+        """
+        for command in commands:
+            properties = dict(command["properties"])
+            properties["tk_krita_stub"] = True
+            self.register_command(
+                command["name"],
+                functools.partial(self._run_lazy_command, app.instance_name, command["name"]),
+                properties,
+            )
+
+    def _run_lazy_command(self, app_instance_name, command_name):
+        """
+        Initializes the app if needed and runs the given command.
+        """
+        app = self._load_lazy_app(app_instance_name)
+        if app is None:
+            return
+
+        for (name, properties) in self._get_app_commands(app):
+            if name == command_name and not properties.get("tk_krita_stub"):
+                callback = self.commands[
+                    "%s:%s" % (properties["prefix"], name)
+                    if properties.get("prefix")
+                    else name
+                ]["callback"]
+                return callback()
+
+        self.logger.warning(
+            "App '%s' did not register the command '%s' once initialized.",
+            app_instance_name,
+            command_name,
+        )
+
+    def _load_lazy_app(self, app_instance_name):
+        """
+        Initializes an app whose initialization was deferred until its first
+        use, replacing its command stubs with the real commands.
+
+        :returns: The app or None if it could not be initialized.
+        """
+        app = self.apps.get(app_instance_name)
+        lazy_app, key = self._lazy_apps.pop(app_instance_name, (None, None))
+        if lazy_app is not app:
+            key = None
+
+        # the stubs are set on the app instance, an app that does not have
+        # them anymore is already initialized
+        if app is None or "init_app" not in vars(app):
+            return app
+
+        stub_names = []
+        for (name, command) in list(self.commands.items()):
+            if command["properties"].get("app") is app:
+                stub_names.append(name)
+                del self.commands[name]
+
+        known_names = set(self.commands)
+
+        self.logger.debug("Initializing app %s on first use...", app_instance_name)
+        start = time.perf_counter()
+
+        # back to the methods of the app
+        del app.init_app
+        del app.post_engine_init
+        del app.destroy_app
+
+        try:
+            app.init_app()
+            app.post_engine_init()
+        except Exception:
+            self.logger.exception("Could not initialize app %s", app_instance_name)
+            return None
+
+        self.logger.debug(
+            "Initialized app %s in %.1f ms",
+            app_instance_name,
+            (time.perf_counter() - start) * 1000.0,
+        )
+
+        # the engine only knows which app registers a command while it is
+        # initializing the apps
+        new_names = [name for name in self.commands if name not in known_names]
+        for name in new_names:
+            self.commands[name]["properties"].setdefault("app", app)
+
+        if key is not None and self.command_cache:
+            self.command_cache.set(key, self._get_app_commands(app))
+            self.command_cache.save()
+
+        # the app registered different commands than the last time
+        if sorted(new_names) != sorted(stub_names):
+            self.create_shotgun_menu()
+
+        return app
+
+    @_startup_span("KritaEngine.init_engine")
+    @_traced("KritaEngine.init_engine")
     def init_engine(self):
         """
         Initializes the Krita engine.
@@ -740,14 +1567,37 @@ class KritaEngine(Engine):
         self.log_info("set_active_document_context_switch: %s" % value)
 
         if not value:
-            self.active_doc_timer.stop()
+            self.active_doc_tracker.stop()
         else:
-            self.active_doc_timer.start(1000)
+            self.active_doc_tracker.start()
 
     active_document_context_switch = property(
         __get_active_document_context_switch, __set_active_document_context_switch
     )
 
+    def toggle_tracing(self):
+        """
+        Starts or stops recording the trace of the engine activity. When
+        stopped, the trace recorded so far is written to the toolkit log
+        folder.
+        """
+        trace_recorder = self.trace_recorder
+        trace_recorder.enabled = not trace_recorder.enabled
+
+        if trace_recorder.enabled:
+            self.logger.info("Recording trace...")
+            return True
+
+        try:
+            trace_path = trace_recorder.write(LogManager().log_folder)
+        except (IOError, OSError) as e:
+            self.logger.error("Could not write the trace: %s", e)
+        else:
+            self.logger.info("Trace written to: %s", trace_path)
+            trace_recorder.clear()
+
+        return False
+
     def toggle_active_document_context_switch(self):
         """
         Toggles the automatic switch context when the view is changed. If the
@@ -758,6 +1608,9 @@ class KritaEngine(Engine):
 
         return self.active_document_context_switch
 
+    @_startup_span("KritaEngine.create_shotgun_menu")
+    @_traced("KritaEngine.create_shotgun_menu")
+    @_timed("tk_krita_menu_rebuild_seconds", "Time spent building the Shotgun menu.")
     def create_shotgun_menu(self, disabled=False):
         """
         Creates the main shotgun menu in Krita.
@@ -770,25 +1623,73 @@ class KritaEngine(Engine):
         if self.has_ui:
             # create our menu handler
             tk_krita = self.import_module("tk_krita")
-            if tk_krita.can_create_menu():
+            if tk_krita.can_create_menu(self.window_registry):
                 self.logger.debug("Creating shotgun menu...")
                 self._menu_generator = tk_krita.MenuGenerator(self, self._menu_name)
                 self._menu_generator.create_menu(disabled=disabled)
-            else:
-                self.logger.debug("Waiting for menu to be created...")
-                from sgtk.platform.qt import QtCore
 
-                QtCore.QTimer.singleShot(200, self.create_shotgun_menu)
+                self.startup_recorder.end(self._menu_wait_span)
+                if not self._startup_menu_created:
+                    self._startup_menu_created = True
+
+                    # time since Krita started loading the extension
+                    recorder = self.startup_recorder
+                    recorder.record("time to menu", recorder.origin, time.perf_counter())
+                    self.logger.debug(
+                        "Shotgun menu available %.1f ms after startup.",
+                        (time.perf_counter() - recorder.origin) * 1000.0,
+                    )
+
+                    self._finish_startup_timing()
+            elif not self._menu_wait_connected:
+                # Krita creates the main window after loading the extensions,
+                # so we wait for it to tell us the window exists.
+                self.logger.debug("Waiting for the main window to create the menu...")
+
+                if self._menu_wait_span is None:
+                    self._menu_wait_span = self.startup_recorder.begin(
+                        "KritaEngine.create_shotgun_menu: waiting for the menubar",
+                        detached=True,
+                    )
+
+                self.document_events.subscribe(
+                    tk_krita.WINDOW_CREATED, self._on_menu_window_created
+                )
+                self._menu_wait_connected = True
             return True
 
         return False
 
+    def _on_menu_window_created(self):
+        """
+        A Krita window was created, build the menu we were waiting to build.
+        """
+        tk_krita = self.import_module("tk_krita")
+        self.document_events.unsubscribe(tk_krita.WINDOW_CREATED, self._on_menu_window_created)
+        self._menu_wait_connected = False
+
+        # let the window finish setting up its menu bar
+        from sgtk.platform.qt import QtCore
+
+        QtCore.QTimer.singleShot(0, self.create_shotgun_menu)
+
+    @_startup_span("KritaEngine.post_app_init")
+    @_traced("KritaEngine.post_app_init")
     def post_app_init(self):
         """
         Called when all apps have initialized
         """
+        # undo the wrappers of get_application in the reverse order they
+        # were installed, the lazy one wraps the timing one
+        self._stop_lazy_apps()
+        self._stop_apps_timing()
+
         tank.platform.engine.set_current_engine(self)
 
+        self.document_events.start()
+        if self.json_log_sink:
+            self._update_json_log_document()
+
         # create the shotgun menu
         self.create_shotgun_menu()
 
@@ -797,16 +1698,59 @@ class KritaEngine(Engine):
         from sgtk.platform.qt import QtGui
 
         app = QtGui.QApplication.instance()
-        app.aboutToQuit.connect(self.destroy_engine)
+        if app:
+            app.aboutToQuit.connect(self.destroy_engine)
+
+        self._register_engine_commands()
 
-        # apply a fix to multi python console if loaded
-        pythonconsole_app = self.apps.get("tk-multi-pythonconsole")
-        if pythonconsole_app:
-            _fix_tk_multi_pythonconsole(self.logger)
+        if self.headless:
+            # nobody to look at the menu, the panels or the startup commands
+            self.logger.debug("%s: Running headless.", self)
+            return
+
+        # the startup code may have started the engine from a snapshot of the
+        # context of a previous launch, check it once Krita is up.
+        bootstrap = getattr(krita.shotgun, "bootstrap_snapshot", None)
+        if bootstrap:
+            krita.shotgun.bootstrap_snapshot = None
+
+            from sgtk.platform.qt import QtCore
+
+            QtCore.QTimer.singleShot(
+                0, functools.partial(self._refresh_bootstrap_snapshot, bootstrap)
+            )
+
+        # start following the active document if the artist wants us to
+        if self.active_document_context_switch:
+            self.active_doc_tracker.start()
+
+        if self.context_prewarmer and self.has_ui:
+            self.context_prewarmer.start()
+
+        # dump the metrics regularly for the node exporter to pick them up
+        if self.get_setting("metrics_textfile_folder", ""):
+            from sgtk.platform.qt import QtCore
+
+            self._metrics_timer = QtCore.QTimer()
+            self._metrics_timer.setInterval(
+                self.get_setting("metrics_dump_interval", 60) * 1000
+            )
+            self._metrics_timer.timeout.connect(self.dump_metrics)
+            self._metrics_timer.start()
 
         # Run a series of app instance commands at startup.
         self._run_app_instance_commands()
 
+    def pre_context_change(self, old_context, new_context):
+        """
+        Runs before a context change. The apps are reloaded for the new
+        context, so their initialization is deferred again.
+
+        :param old_context: The context being changed away from.
+        :param new_context: The new context being changed to.
+        """
+        self._start_lazy_apps()
+
     def post_context_change(self, old_context, new_context):
         """
         Runs after a context change. The Krita event watching will be stopped
@@ -815,22 +1759,66 @@ class KritaEngine(Engine):
         :param old_context: The context being changed away from.
         :param new_context: The new context being changed to.
         """
+        self._stop_lazy_apps()
+
+        self._register_engine_commands()
 
-        # apply a fix to multi python console if loaded
-        pythonconsole_app = self.apps.get("tk-multi-pythonconsole")
-        if pythonconsole_app:
-            _fix_tk_multi_pythonconsole(self.logger)
+        # the context of the json log records needs to be updated
+        self._json_log_context = None
 
         if self.get_setting("automatic_context_switch", True):
             # finally create the menu with the new context if needed
             if old_context != new_context:
                 self.create_shotgun_menu()
 
+    def _register_engine_commands(self):
+        """
+        Registers the commands provided by the engine itself, which are shown
+        in the context menu.
+        """
+        if not self.has_ui:
+            return
+
+        if "Log Console..." not in self.commands:
+            self.register_command(
+                "Log Console...",
+                self.show_log_console,
+                {
+                    "type": "context_menu",
+                    "short_name": "log_console",
+                    "description": "Shows the latest messages logged by Toolkit.",
+                },
+            )
+
+    def show_log_console(self):
+        """
+        Shows the panel with the log records kept in memory.
+        """
+        tk_krita = self.import_module("tk_krita")
+        return self.show_panel(
+            LOG_CONSOLE_PANEL_ID,
+            "Shotgun Log Console",
+            self,
+            tk_krita.LogConsoleWidget,
+            self.log_buffer,
+        )
+
+    @_startup_span("KritaEngine._run_app_instance_commands")
+    @_traced("KritaEngine._run_app_instance_commands")
     def _run_app_instance_commands(self):
         """
         Runs the series of app instance commands listed in the
         'run_at_startup' setting of the environment configuration YAML file.
+
+        Commands are not run straight away, they are queued by priority and
+        run one at a time whenever Krita is idle, so Krita becomes
+        interactive first and the startup apps show up progressively.
         """
+        tk_krita = self.import_module("tk_krita")
+        recorder = self.startup_recorder
+        self._startup_scheduler = tk_krita.IdleCommandScheduler(
+            self.logger, recorder=None if recorder.closed else recorder
+        )
 
         # Build a dictionary mapping app instance names to dictionaries of
         # commands they registered with the engine.
@@ -852,6 +1840,9 @@ class KritaEngine(Engine):
             # given app instance.
             setting_cmd_name = app_setting_dict["name"]
 
+            # lower priorities run first
+            priority = app_setting_dict.get("priority", 0)
+
             # Retrieve the command dictionary of the given app instance.
             cmd_dict = app_instance_commands.get(app_instance_name)
 
@@ -866,29 +1857,35 @@ class KritaEngine(Engine):
                 if not setting_cmd_name:
                     # Run all commands of the given app instance.
                     for (cmd_name, command_function) in cmd_dict.items():
-                        msg = (
-                            "%s startup running app '%s' command '%s'.",
+                        self.logger.debug(
+                            "%s startup queuing app '%s' command '%s'.",
                             self.name,
                             app_instance_name,
                             cmd_name,
                         )
-                        self.logger.debug(msg)
 
-                        command_function()
+                        self._startup_scheduler.add(
+                            "%s: %s" % (app_instance_name, cmd_name),
+                            command_function,
+                            priority,
+                        )
                 else:
                     # Run the command whose name is listed in the
                     # 'run_at_startup' setting.
                     command_function = cmd_dict.get(setting_cmd_name)
                     if command_function:
-                        msg = (
-                            "%s startup running app '%s' command '%s'.",
+                        self.logger.debug(
+                            "%s startup queuing app '%s' command '%s'.",
                             self.name,
                             app_instance_name,
                             setting_cmd_name,
                         )
-                        self.logger.debug(msg)
 
-                        command_function()
+                        self._startup_scheduler.add(
+                            "%s: %s" % (app_instance_name, setting_cmd_name),
+                            command_function,
+                            priority,
+                        )
                     else:
                         known_commands = ", ".join("'%s'" % name for name in cmd_dict)
                         self.logger.warning(
@@ -901,12 +1898,56 @@ class KritaEngine(Engine):
                             known_commands,
                         )
 
+        self._startup_scheduler.start()
+
+    @_traced("KritaEngine.destroy_engine")
     def destroy_engine(self):
         """
         Let's close the windows created by the engine before exiting the
         application
         """
         self.logger.debug("%s: Destroying...", self)
+
+        self.active_doc_tracker.stop()
+        self.context_resolver.stop()
+        if self.context_prewarmer:
+            self.context_prewarmer.stop()
+        self.document_events.stop()
+        if self._bootstrap_resolver:
+            self._bootstrap_resolver.stop()
+        if self._startup_scheduler:
+            self._startup_scheduler.cancel()
+        if self._window_registry:
+            self._window_registry.stop()
+        if self.stall_watchdog:
+            self.stall_watchdog.stop()
+        self.task_scheduler.cancel_all()
+        self.compat_patches.uninstall()
+        if self.memory_profiler:
+            self.memory_profiler.stop()
+
+        self.logger.debug("Session metrics: %s", self.metrics.snapshot())
+        if self._metrics_timer:
+            self._metrics_timer.stop()
+
+            # this session is over, so are its metrics
+            try:
+                os.remove(self.metrics_textfile_path)
+            except OSError:
+                pass
+
+        if self.json_log_sink:
+            for event in self._json_log_document_events:
+                self.document_events.unsubscribe(event, self._update_json_log_document)
+            self.json_log_sink.stop()
+        self.logger.debug(
+            "Active document refreshes triggered: %s, suppressed: %s",
+            self.active_doc_tracker.triggered_count,
+            self.active_doc_tracker.suppressed_count,
+        )
+        self.logger.debug("Document events: %s", self.document_events.emitted_counts)
+        self.logger.debug("Documents memory estimates: %s", self.memory_monitor.stats())
+
         self.close_windows()
 
     def _init_pyside(self):
@@ -931,6 +1972,10 @@ class KritaEngine(Engine):
         Get the QWidget parent for all dialogs created through
         show_dialog & show_modal.
         """
+        main_window = self.window_registry.main_window
+        if main_window is not None:
+            return main_window
+
         import PyQt5.QtWidgets
         from PyQt5.QtWidgets import QApplication
 
@@ -946,7 +1991,7 @@ class KritaEngine(Engine):
         :param panel_id: Unique identifier for the panel, as obtained by register_panel().
         :param title: The title of the panel
         :param bundle: The app, engine or framework object that is associated with this window
-        :param widget_class: The class of the UI to be constructed. 
+        :param widget_class: The class of the UI to be constructed.
                              This must derive from QWidget.
         Additional parameters specified will be passed through to the widget_class constructor.
         :returns: the created widget_class instance
@@ -956,7 +2001,7 @@ class KritaEngine(Engine):
         dock_widget_id = "sgtk_dock_widget_" + panel_id
 
         main_window = self._get_dialog_parent()
-        dock_widget = main_window.findChild(QtGui.QDockWidget, dock_widget_id)
+        dock_widget = self.window_registry.dock_widget(dock_widget_id)
 
         if dock_widget is None:
             # The dock widget wrapper cannot be found in the main window's
@@ -967,7 +2012,7 @@ class KritaEngine(Engine):
 
             class DockWidget(QtGui.QDockWidget):
                 """
-                Widget used for docking app panels that ensures the widget is closed when the 
+                Widget used for docking app panels that ensures the widget is closed when the
                 dock is closed
                 """
 
@@ -988,10 +2033,21 @@ class KritaEngine(Engine):
 
             # Remember the dock widget, so we can delete it later.
             self._dock_widgets.append(dock_widget)
+            self.window_registry.add_dock_widget(dock_widget)
+
+            # the panel is torn down if it stays hidden for too long and
+            # created again once its dock is visible.
+            def rebuild_panel():
+                widget_instance = widget_class(*args, **kwargs)
+                widget_instance.setObjectName(panel_id)
+                self._apply_external_stylesheet(bundle, widget_instance)
+                return widget_instance
+
+            self.panel_lifecycle.add(dock_widget, rebuild_panel)
         else:
             # The dock widget wrapper already exists, so just get the
             # shotgun panel from it.
-            widget_instance = dock_widget.widget()
+            widget_instance = self.panel_lifecycle.widget(dock_widget)
 
         # apply external style sheet
         self._apply_external_stylesheet(bundle, widget_instance)
@@ -1011,6 +2067,8 @@ class KritaEngine(Engine):
         """
         self._get_dialog_parent().removeDockWidget(dock_widget)
         self._dock_widgets.remove(dock_widget)
+        self.window_registry.remove_dock_widget(dock_widget)
+        self.panel_lifecycle.remove(dock_widget)
         dock_widget.deleteLater()
 
     @property
@@ -1018,9 +2076,22 @@ class KritaEngine(Engine):
         """
         Detect and return if Krita is running in batch mode
         """
+        if self._headless:
+            return False
+
         batch_mode = krita.Krita.instance().batchmode()
         return not batch_mode
 
+    @property
+    def headless(self):
+        """
+        Returns True if the engine was started without any UI, ie. from
+        kritarunner in a render farm, see HEADLESS_ENV. Unlike has_ui, it
+        does not change when hooks temporarily enable the batch mode of
+        Krita.
+        """
+        return self._headless
+
     def _emit_log_message(self, handler, record):
         """
         Called by the engine to log messages in Krita script editor.
@@ -1033,17 +2104,19 @@ class KritaEngine(Engine):
         :param record: Standard python logging record.
         :type record: :class:`~python.logging.LogRecord`
         """
-        # Give a standard format to the message:
-        #     Shotgun <basename>: <message>
-        # where "basename" is the leaf part of the logging record name,
-        # for example "tk-multi-shotgunpanel" or "qt_importer".
         if record.levelno < logging.INFO:
-            formatter = logging.Formatter("Debug: Shotgun %(basename)s: %(message)s")
+            formatter = DEBUG_LOG_FORMATTER
         else:
-            formatter = logging.Formatter("Shotgun %(basename)s: %(message)s")
+            formatter = LOG_FORMATTER
 
         msg = formatter.format(record)
 
+        if self.log_buffer is not None:
+            self.log_buffer.append_record(record, msg)
+            self._emit_json_log_record(record)
+        else:
+            self._early_log_records.append((record, msg))
+
         # Select Krita display function to use according to the logging
         # record level.
         if record.levelno >= logging.ERROR:
@@ -1055,8 +2128,68 @@ class KritaEngine(Engine):
         else:
             fct = display_debug
 
+        # headless sessions may not run an event loop, ie. kritarunner, so
+        # messages logged from the main thread are displayed straight away
+        if self._headless and threading.current_thread() is threading.main_thread():
+            fct(msg)
+            return
+
         # Display the message in Krita script editor in a thread safe manner.
-        self.async_execute_in_main_thread(fct, msg)
+        # Messages are queued and displayed in batches, so only the first
+        # message since the last batch needs to reach the main thread.
+        self._log_queue.append((fct, msg))
+
+        with self._log_lock:
+            if self._log_flush_pending:
+                return
+            self._log_flush_pending = True
+
+        self.async_execute_in_main_thread(self._flush_log_messages)
+
+    def _emit_json_log_record(self, record):
+        """
+        Sends the record to the json log sink, if enabled, along with the
+        engine context and the active document.
+        """
+        if self.json_log_sink is None:
+            return
+
+        # the context only changes in post_context_change
+        if self._json_log_context is None and self.context:
+            self._json_log_context = dict(
+                (key, value.get("id") if isinstance(value, dict) else value)
+                for (key, value) in (
+                    ("project", self.context.project),
+                    ("entity", self.context.entity),
+                    ("step", self.context.step),
+                    ("task", self.context.task),
+                    ("description", str(self.context)),
+                )
+            )
+
+        self.json_log_sink.emit(
+            self._log_record_to_dict(
+                record,
+                engine=self.name,
+                engine_version=self.version,
+                context=self._json_log_context,
+                document=self._json_log_document,
+                perf_counter=time.perf_counter(),
+            )
+        )
+
+    def _flush_log_messages(self):
+        """
+        Displays all the log messages queued so far. Runs in the main thread.
+        """
+        with self._log_lock:
+            self._log_flush_pending = False
+
+        messages = []
+        while self._log_queue:
+            messages.append(self._log_queue.popleft())
+
+        display_batch(messages)
 
     def close_windows(self):
         """
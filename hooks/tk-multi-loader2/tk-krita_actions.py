@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -270,6 +270,14 @@ class KritaActions(HookBaseClass):
         # characters are supported
         path = self.get_publish_path(sg_publish_data).replace(os.path.sep, "/")
 
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.traced(name, path=path), tk_krita.watched(name):
+            self._execute_action(name, path, sg_publish_data)
+
+    def _execute_action(self, name, path, sg_publish_data):
+        """
+        Executes the given action on the resolved path, see execute_action.
+        """
         if name == "open_image":
             if not self._is_a_supported_extension(path, sg_publish_data):
                 raise Exception("Unsupported file extension for '%s'!" % path)
@@ -294,32 +302,55 @@ class KritaActions(HookBaseClass):
 
     # it opens the image as a new layer of the current document
     def _open_as_layer(self, path, sg_publish_data):
-        krita_app = Krita.instance()
-        doc = krita_app.activeDocument()
-        if not doc:
-            return False
-
-        filename_file = os.path.basename(path)
-        filename_filename, _ = os.path.splitext(filename_file)
-        layer_name = filename_filename
-        layer_node = doc.createNode(layer_name, "paintlayer")
-        doc.rootNode().addChildNode(layer_node, None)
-
-        # load as a different doc
-        layer_doc = krita_app.openDocument(path)
-        layer_doc.waitForDone()
-        pixel_data = layer_doc.pixelData(0, 0, layer_doc.width(), layer_doc.height())
-
-        # paste pixel info
-        layer_node.setPixelData(pixel_data, 0, 0, layer_doc.width(), layer_doc.height())
-        doc.waitForDone()
-
-        doc.setActiveNode(layer_node)
-        doc.refreshProjection()
-        doc.waitForDone()
-
-        # no need anymore
-        layer_doc.close()
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.timed("tk_krita_open_as_layer_seconds"):
+            krita_app = Krita.instance()
+            doc = krita_app.activeDocument()
+            if not doc:
+                return False
+
+            filename_file = os.path.basename(path)
+            filename_filename, _ = os.path.splitext(filename_file)
+            operation = "Opening '%s' as a layer" % filename_file
+
+            # the image is loaded as a document, then its pixels are copied
+            # once out of it and once into the layer. Check it before loading
+            # the image if we can tell its size from the file.
+            image_bytes = tk_krita.estimate_image_memory(path, doc)
+            if image_bytes is not None:
+                memory_warning = tk_krita.check_memory_budget(
+                    operation, doc, extra_bytes=3 * image_bytes
+                )
+                if memory_warning:
+                    self.logger.warning(memory_warning)
+
+            layer_name = filename_filename
+            layer_node = doc.createNode(layer_name, "paintlayer")
+            doc.rootNode().addChildNode(layer_node, None)
+
+            # load as a different doc
+            layer_doc = krita_app.openDocument(path)
+            layer_doc.waitForDone()
+
+            if image_bytes is None:
+                memory_warning = tk_krita.check_memory_budget(
+                    operation, layer_doc, canvas_copies=2
+                )
+                if memory_warning:
+                    self.logger.warning(memory_warning)
+
+            pixel_data = layer_doc.pixelData(0, 0, layer_doc.width(), layer_doc.height())
+
+            # paste pixel info
+            layer_node.setPixelData(pixel_data, 0, 0, layer_doc.width(), layer_doc.height())
+            doc.waitForDone()
+
+            doc.setActiveNode(layer_node)
+            doc.refreshProjection()
+            doc.waitForDone()
+
+            # no need anymore
+            layer_doc.close()
 
     # creates a new document and import the sequence of images as animated frames
     def _import_animation_frames(self, path, sg_publish_data):
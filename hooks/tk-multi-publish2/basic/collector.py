@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -17,8 +17,6 @@ import sgtk
 from sgtk import TankError
 from sgtk.util.filesystem import create_valid_filename
 
-from krita import Krita
-
 __author__ = "Diego Garcia Huerta"
 __contact__ = "https://www.linkedin.com/in/diegogh/"
 
@@ -91,22 +89,24 @@ class KritaSessionCollector(HookBaseClass):
         :param parent_item: Root item instance
 
         """
-        items = []
-
-        # create an item representing the current krita session
-        session_item = self.collect_current_krita_session(settings, parent_item)
-        if session_item:
-            items.append(session_item)
-
-            # check if there are any layers to publish
-            publish_as_folder_setting = settings.get("Publish Layers as Folder")
-            if publish_as_folder_setting and publish_as_folder_setting.value:
-                layer_items = self.collect_krita_layers_as_folder(settings, session_item)
-            else:
-                layer_items = self.collect_krita_layers(settings, session_item)
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("collector.process_current_session"):
+            items = []
+
+            # create an item representing the current krita session
+            session_item = self.collect_current_krita_session(settings, parent_item)
+            if session_item:
+                items.append(session_item)
+
+                # check if there are any layers to publish
+                publish_as_folder_setting = settings.get("Publish Layers as Folder")
+                if publish_as_folder_setting and publish_as_folder_setting.value:
+                    layer_items = self.collect_krita_layers_as_folder(settings, session_item)
+                else:
+                    layer_items = self.collect_krita_layers(settings, session_item)
 
-            items.append(layer_items)
-        return items
+                items.append(layer_items)
+            return items
 
     def collect_current_krita_session(self, settings, parent_item):
         """
@@ -239,8 +239,8 @@ class KritaSessionCollector(HookBaseClass):
         layer_items = []
         layer_names = []
 
-        krita_app = Krita.instance()
-        doc = krita_app.activeDocument()
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        doc = tk_krita.active_document()
 
         if doc:
             parent_node = doc.rootNode()
@@ -279,8 +279,8 @@ class KritaSessionCollector(HookBaseClass):
 
         publisher = self.parent
 
-        krita_app = Krita.instance()
-        doc = krita_app.activeDocument()
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        doc = tk_krita.active_document()
 
         if doc:
             parent_node = doc.rootNode()
@@ -341,8 +341,8 @@ def _session_path():
     """
     path = None
 
-    krita_app = Krita.instance()
-    active_doc = krita_app.activeDocument()
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+    active_doc = tk_krita.active_document()
     if active_doc:
         path = active_doc.fileName()
 
@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -325,7 +325,7 @@ class KritaLayerPublishPlugin(HookBaseClass):
 
     def get_export_path(self, settings, item):
         """
-        Retrieves the path to export eh layer before it gets copied to the 
+        Retrieves the path to export eh layer before it gets copied to the
         publish location. This is handy if you use a different location for
         wip files than publish files.
 
@@ -334,7 +334,7 @@ class KritaLayerPublishPlugin(HookBaseClass):
             instances.
         :param item: Item to process
 
-        :returns: the location where the layer will be export before it is 
+        :returns: the location where the layer will be export before it is
             published
         """
         publisher = self.parent
@@ -495,25 +495,57 @@ class KritaLayerPublishPlugin(HookBaseClass):
         :param item: Item to process
         :returns: True if item is valid, False otherwise.
         """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_layer.validate"), tk_krita.watched(
+            "publish_layer.validate"
+        ):
+            node_name = item.properties["node_name"]
+            self.logger.debug("Validating layer: %s" % node_name)
 
-        node_name = item.properties["node_name"]
-        self.logger.debug("Validating layer: %s" % node_name)
+            publisher = self.parent
 
-        publisher = self.parent
+            self.session_validate(settings, item)
+            self.templates_validate(settings, item)
+
+            # the layer is rendered to the size of the whole canvas to export it
+            memory_warning = tk_krita.check_memory_budget(
+                "Exporting the layer", item.properties.get("session_document")
+            )
+            if memory_warning:
+                self.logger.warning(memory_warning)
 
-        self.session_validate(settings, item)
-        self.templates_validate(settings, item)
+            # figure out the export path
+            export_path = self.get_export_path(settings, item)
 
-        # figure out the export path
-        export_path = self.get_export_path(settings, item)
+            # and the publish path
+            publish_path = self.get_publish_path(settings, item)
 
-        # and the publish path
-        publish_path = self.get_publish_path(settings, item)
+            # run the base class validation
+            return super(KritaLayerPublishPlugin, self).validate(settings, item)
+
+    def publish(self, settings, item):
+        """
+        Executes the publish logic for the given item and settings, exporting
+        the layer, see the base class.
+        """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_layer.publish"), tk_krita.watched(
+            "publish_layer.publish"
+        ):
+            super(KritaLayerPublishPlugin, self).publish(settings, item)
 
-        # run the base class validation
-        return super(KritaLayerPublishPlugin, self).validate(settings, item)
+    def finalize(self, settings, item):
+        """
+        Execute the finalization pass, see the base class.
+        """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_layer.finalize"), tk_krita.watched(
+            "publish_layer.finalize"
+        ):
+            super(KritaLayerPublishPlugin, self).finalize(settings, item)
 
     def _export_layer(self, node, export_layer_path, active_doc):
+        tk_krita = self.parent.engine.import_module("tk_krita")
         krita_app = Krita.instance()
         active_doc_bounds = active_doc.rootNode().bounds()
 
@@ -521,16 +553,19 @@ class KritaLayerPublishPlugin(HookBaseClass):
         # unfortunately since this function is not a python one we cannot
         # inspect it, so we do have to check the Krita version to know
         # how to approach this export
-        if is_version_older(krita_app.version(), "4.2.0"):
-            node.save(export_layer_path, active_doc.width(), active_doc.height())
-        else:
-            node.save(
-                export_layer_path,
-                active_doc.width(),
-                active_doc.height(),
-                InfoObject(),
-                active_doc_bounds,
-            )
+        with tk_krita.watched("export_layer"), tk_krita.traced(
+            "export_layer", path=export_layer_path
+        ), tk_krita.timed("tk_krita_export_layer_seconds"):
+            if is_version_older(krita_app.version(), "4.2.0"):
+                node.save(export_layer_path, active_doc.width(), active_doc.height())
+            else:
+                node.save(
+                    export_layer_path,
+                    active_doc.width(),
+                    active_doc.height(),
+                    InfoObject(),
+                    active_doc_bounds,
+                )
 
     def _copy_work_to_publish(self, settings, item):
         """
@@ -623,8 +658,8 @@ def _session_document():
     Return the current active document
     :return:
     """
-    krita_app = Krita.instance()
-    active_doc = krita_app.activeDocument()
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+    active_doc = tk_krita.active_document()
     return active_doc
 
 
@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -374,7 +374,7 @@ class KritaLayersPublishPlugin(HookBaseClass):
 
     def get_export_path(self, settings, item):
         """
-        Retrieves the path to export eh layer before it gets copied to the 
+        Retrieves the path to export eh layer before it gets copied to the
         publish location. This is handy if you use a different location for
         wip files than publish files.
 
@@ -383,7 +383,7 @@ class KritaLayersPublishPlugin(HookBaseClass):
             instances.
         :param item: Item to process
 
-        :returns: the location where the layer will be export before it is 
+        :returns: the location where the layer will be export before it is
             published
         """
         publisher = self.parent
@@ -580,27 +580,59 @@ class KritaLayersPublishPlugin(HookBaseClass):
         :param item: Item to process
         :returns: True if item is valid, False otherwise.
         """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_layers.validate"), tk_krita.watched(
+            "publish_layers.validate"
+        ):
+            publisher = self.parent
+
+            self.session_validate(settings, item)
+            self.templates_validate(settings, item)
+
+            # every layer is rendered to the size of the whole canvas to export it
+            memory_warning = tk_krita.check_memory_budget(
+                "Exporting the layers", item.properties.get("session_document")
+            )
+            if memory_warning:
+                self.logger.warning(memory_warning)
 
-        publisher = self.parent
+            # set a nice thumbnail for this item so the publish also has one for free
+            doc_thumbnail = self.get_document_thumbnail(settings, item)
+            if os.path.getsize(doc_thumbnail) > 0:
+                item.set_thumbnail_from_path(doc_thumbnail)
 
-        self.session_validate(settings, item)
-        self.templates_validate(settings, item)
+            # figure out the export path
+            export_path = self.get_export_path(settings, item)
 
-        # set a nice thumbnail for this item so the publish also has one for free
-        doc_thumbnail = self.get_document_thumbnail(settings, item)
-        if os.path.getsize(doc_thumbnail) > 0:
-            item.set_thumbnail_from_path(doc_thumbnail)
+            # and the publish path
+            publish_path = self.get_publish_path(settings, item)
 
-        # figure out the export path
-        export_path = self.get_export_path(settings, item)
+            # run the base class validation
+            return super(KritaLayersPublishPlugin, self).validate(settings, item)
 
-        # and the publish path
-        publish_path = self.get_publish_path(settings, item)
+    def publish(self, settings, item):
+        """
+        Executes the publish logic for the given item and settings, exporting
+        the layers, see the base class.
+        """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_layers.publish"), tk_krita.watched(
+            "publish_layers.publish"
+        ):
+            super(KritaLayersPublishPlugin, self).publish(settings, item)
 
-        # run the base class validation
-        return super(KritaLayersPublishPlugin, self).validate(settings, item)
+    def finalize(self, settings, item):
+        """
+        Execute the finalization pass, see the base class.
+        """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_layers.finalize"), tk_krita.watched(
+            "publish_layers.finalize"
+        ):
+            super(KritaLayersPublishPlugin, self).finalize(settings, item)
 
     def _export_layer(self, node, export_layer_path, active_doc):
+        tk_krita = self.parent.engine.import_module("tk_krita")
         krita_app = Krita.instance()
         active_doc_bounds = active_doc.rootNode().bounds()
 
@@ -608,16 +640,19 @@ class KritaLayersPublishPlugin(HookBaseClass):
         # unfortunately since this function is not a python one we cannot
         # inspect it, so we do have to check the Krita version to know
         # how to approach this export
-        if is_version_older(krita_app.version(), "4.2.0"):
-            node.save(export_layer_path, active_doc.width(), active_doc.height())
-        else:
-            node.save(
-                export_layer_path,
-                active_doc.width(),
-                active_doc.height(),
-                InfoObject(),
-                active_doc_bounds,
-            )
+        with tk_krita.watched("export_layer"), tk_krita.traced(
+            "export_layer", path=export_layer_path
+        ), tk_krita.timed("tk_krita_export_layer_seconds"):
+            if is_version_older(krita_app.version(), "4.2.0"):
+                node.save(export_layer_path, active_doc.width(), active_doc.height())
+            else:
+                node.save(
+                    export_layer_path,
+                    active_doc.width(),
+                    active_doc.height(),
+                    InfoObject(),
+                    active_doc_bounds,
+                )
 
     def get_document_thumbnail(self, settings, item):
         active_doc = item.properties.get("session_document")
@@ -631,6 +666,73 @@ class KritaLayersPublishPlugin(HookBaseClass):
 
         return temp_path
 
+    def _export_layers(
+        self,
+        settings,
+        item,
+        nodes,
+        export_path,
+        layer_name_template,
+        default_extension,
+        active_doc,
+    ):
+        """
+        Exports the given layers, yielding the path of every exported layer.
+        Returns the path of the last one.
+        """
+        export_layer_path = None
+
+        for node in nodes:
+            node_name = sanitize_node_name(node.name())
+
+            layer_name = None
+            if layer_name_template:
+                layer_name = self.get_path_from_work_template(
+                    settings, item, layer_name_template, extra_fields={"name": node_name}
+                )
+
+            if not layer_name:
+                # create one ourselves if no template was defined
+                layer_name = "%s.%s" % (node_name, default_extension)
+
+            export_layer_path = os.path.join(export_path, layer_name)
+
+            # finally export he layer, in batch mode. Krita processes events
+            # between layers, so it goes back to the artist's mode for them.
+            with _batch_mode(True):
+                self._export_layer(node, export_layer_path, active_doc)
+            self.logger.debug("Exported layer '%s' to %s" % (node_name, export_layer_path))
+
+            yield export_layer_path
+
+        return export_layer_path
+
+    def _run_export_task(self, engine, task_scheduler, export_layers, session_path):
+        """
+        Exports the layers as a task of the engine, so Krita keeps processing
+        events in between. The export is cancelled if the artist closes the
+        document in the meantime.
+        """
+        tk_krita = engine.import_module("tk_krita")
+        task = task_scheduler.add(export_layers, name="export layers")
+
+        def on_document_closed(path):
+            if path and os.path.normcase(path) == os.path.normcase(
+                os.path.abspath(session_path)
+            ):
+                task.cancel()
+
+        engine.document_events.subscribe(tk_krita.DOCUMENT_CLOSED, on_document_closed)
+        try:
+            return task_scheduler.run_until_complete(task)
+        except tk_krita.TaskCancelled:
+            raise TankError(
+                "The document '%s' was closed while its layers were being exported."
+                % session_path
+            )
+        finally:
+            engine.document_events.unsubscribe(tk_krita.DOCUMENT_CLOSED, on_document_closed)
+
     def _copy_work_to_publish(self, settings, item):
         """
         This method handles exporting a layer and copying it to a designated
@@ -665,25 +767,29 @@ class KritaLayersPublishPlugin(HookBaseClass):
         export_path = self.get_export_path(settings, item)
         ensure_folder_exists(export_path)
 
-        # we export in batch mode
-        with _batch_mode(True):
-            for node in nodes:
-                node_name = sanitize_node_name(node.name())
-
-                layer_name = None
-                if layer_name_template:
-                    layer_name = self.get_path_from_work_template(
-                        settings, item, layer_name_template, extra_fields={"name": node_name}
-                    )
-
-                if not layer_name:
-                    # create one ourselves if no template was defined
-                    layer_name = "%s.%s" % (node_name, default_extension)
-
-                export_layer_path = os.path.join(export_path, layer_name)
+        export_layers = self._export_layers(
+            settings,
+            item,
+            nodes,
+            export_path,
+            layer_name_template,
+            default_extension,
+            active_doc,
+        )
 
-                # finally export he layer
-                self._export_layer(node, export_layer_path, active_doc)
+        # exporting many layers can take a while, let Krita repaint between
+        # layers if the engine can do that for us. There is nothing to repaint
+        # when running headless, ie. in a render farm.
+        engine = self.parent.engine
+        task_scheduler = getattr(engine, "task_scheduler", None)
+        if task_scheduler and not getattr(engine, "headless", False):
+            export_layer_path = self._run_export_task(
+                engine, task_scheduler, export_layers, session_path
+            )
+        else:
+            export_layer_path = None
+            for export_layer_path in export_layers:
+                pass
 
         item.set_thumbnail_from_path(export_layer_path)
 
@@ -735,8 +841,8 @@ def _session_document():
     Return the current active document
     :return:
     """
-    krita_app = Krita.instance()
-    active_doc = krita_app.activeDocument()
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+    active_doc = tk_krita.active_document()
     return active_doc
 
 
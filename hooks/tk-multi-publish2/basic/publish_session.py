@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -246,6 +246,7 @@ class KritaSessionPublishPlugin(HookBaseClass):
         return publish_template
 
     def _export_layer(self, node, export_layer_path, active_doc):
+        tk_krita = self.parent.engine.import_module("tk_krita")
         krita_app = Krita.instance()
         active_doc_bounds = active_doc.rootNode().bounds()
 
@@ -253,16 +254,19 @@ class KritaSessionPublishPlugin(HookBaseClass):
         # unfortunately since this function is not a python one we cannot
         # inspect it, so we do have to check the Krita version to know
         # how to approach this export
-        if is_version_older(krita_app.version(), "4.2.0"):
-            node.save(export_layer_path, active_doc.width(), active_doc.height())
-        else:
-            node.save(
-                export_layer_path,
-                active_doc.width(),
-                active_doc.height(),
-                InfoObject(),
-                active_doc_bounds,
-            )
+        with tk_krita.watched("export_layer"), tk_krita.traced(
+            "export_layer", path=export_layer_path
+        ), tk_krita.timed("tk_krita_export_layer_seconds"):
+            if is_version_older(krita_app.version(), "4.2.0"):
+                node.save(export_layer_path, active_doc.width(), active_doc.height())
+            else:
+                node.save(
+                    export_layer_path,
+                    active_doc.width(),
+                    active_doc.height(),
+                    InfoObject(),
+                    active_doc_bounds,
+                )
 
     def get_document_thumbnail(self, settings, item):
         active_doc = item.properties.get("session_document")
@@ -358,45 +362,48 @@ class KritaSessionPublishPlugin(HookBaseClass):
         :param item: Item to process
         :returns: True if item is valid, False otherwise.
         """
-
-        publisher = self.parent
-
-        self.session_validate(settings, item)
-        self.templates_validate(settings, item)
-
-        path = item.properties["session_path"]
-
-        # ---- see if the version can be bumped post-publish
-
-        # check to see if the next version of the work file already exists on
-        # disk. if so, warn the user and provide the ability to jump to save
-        # to that version now
-        (next_version_path, version) = self._get_next_version_info(path, item)
-        if next_version_path and os.path.exists(next_version_path):
-
-            # determine the next available version_number. just keep asking for
-            # the next one until we get one that doesn't exist.
-            while os.path.exists(next_version_path):
-                (next_version_path, version) = self._get_next_version_info(
-                    next_version_path, item
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_session.validate"), tk_krita.watched(
+            "publish_session.validate"
+        ):
+            publisher = self.parent
+
+            self.session_validate(settings, item)
+            self.templates_validate(settings, item)
+
+            path = item.properties["session_path"]
+
+            # ---- see if the version can be bumped post-publish
+
+            # check to see if the next version of the work file already exists on
+            # disk. if so, warn the user and provide the ability to jump to save
+            # to that version now
+            (next_version_path, version) = self._get_next_version_info(path, item)
+            if next_version_path and os.path.exists(next_version_path):
+
+                # determine the next available version_number. just keep asking for
+                # the next one until we get one that doesn't exist.
+                while os.path.exists(next_version_path):
+                    (next_version_path, version) = self._get_next_version_info(
+                        next_version_path, item
+                    )
+
+                error_msg = "The next version of this file already exists on disk."
+                self.logger.error(
+                    error_msg,
+                    extra={
+                        "action_button": {
+                            "label": "Save to v%s" % (version,),
+                            "tooltip": "Save to the next available version number, "
+                            "v%s" % (version,),
+                            "callback": lambda: _save_session(next_version_path),
+                        }
+                    },
                 )
+                raise Exception(error_msg)
 
-            error_msg = "The next version of this file already exists on disk."
-            self.logger.error(
-                error_msg,
-                extra={
-                    "action_button": {
-                        "label": "Save to v%s" % (version,),
-                        "tooltip": "Save to the next available version number, "
-                        "v%s" % (version,),
-                        "callback": lambda: _save_session(next_version_path),
-                    }
-                },
-            )
-            raise Exception(error_msg)
-
-        # run the base class validation
-        return super(KritaSessionPublishPlugin, self).validate(settings, item)
+            # run the base class validation
+            return super(KritaSessionPublishPlugin, self).validate(settings, item)
 
     def publish(self, settings, item):
         """
@@ -407,22 +414,26 @@ class KritaSessionPublishPlugin(HookBaseClass):
             instances.
         :param item: Item to process
         """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_session.publish"), tk_krita.watched(
+            "publish_session.publish"
+        ):
+            # get the path in a normalized state. no trailing separator, separators
+            # are appropriate for current os, no double separators, etc.
+            path = sgtk.util.ShotgunPath.normalize(_session_path())
 
-        # get the path in a normalized state. no trailing separator, separators
-        # are appropriate for current os, no double separators, etc.
-        path = sgtk.util.ShotgunPath.normalize(_session_path())
+            # ensure the session is saved
+            _save_session(path)
 
-        # ensure the session is saved
-        _save_session(path)
+            # update the item with the saved session path
+            item.properties["path"] = path
 
-        # update the item with the saved session path
-        item.properties["path"] = path
+            # add dependencies for the base class to register when publishing
+            dependencies = _krita_find_additional_session_dependencies()
+            item.properties["publish_dependencies"] = dependencies
 
-        # add dependencies for the base class to register when publishing
-        item.properties["publish_dependencies"] = _krita_find_additional_session_dependencies()
-
-        # let the base class register the publish
-        super(KritaSessionPublishPlugin, self).publish(settings, item)
+            # let the base class register the publish
+            super(KritaSessionPublishPlugin, self).publish(settings, item)
 
     def finalize(self, settings, item):
         """
@@ -434,12 +445,15 @@ class KritaSessionPublishPlugin(HookBaseClass):
             instances.
         :param item: Item to process
         """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("publish_session.finalize"), tk_krita.watched(
+            "publish_session.finalize"
+        ):
+            # do the base class finalization
+            super(KritaSessionPublishPlugin, self).finalize(settings, item)
 
-        # do the base class finalization
-        super(KritaSessionPublishPlugin, self).finalize(settings, item)
-
-        # bump the session file to the next version
-        self._save_to_next_version(item.properties["path"], item, _save_session)
+            # bump the session file to the next version
+            self._save_to_next_version(item.properties["path"], item, _save_session)
 
 
 def _krita_find_additional_session_dependencies():
@@ -457,8 +471,8 @@ def _session_document():
     Return the current active document
     :return:
     """
-    krita_app = Krita.instance()
-    active_doc = krita_app.activeDocument()
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+    active_doc = tk_krita.active_document()
     return active_doc
 
 
@@ -485,9 +499,14 @@ def _save_session(path):
     folder = os.path.dirname(path)
     ensure_folder_exists(folder)
 
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+
     active_doc = _session_document()
-    success = active_doc.saveAs(path)
-    active_doc.waitForDone()
+    with tk_krita.watched("save_session"), tk_krita.traced(
+        "save_session", path=path
+    ), tk_krita.timed("tk_krita_save_session_seconds"):
+        success = active_doc.saveAs(path)
+        active_doc.waitForDone()
 
     if success:
         active_doc.setFileName(path)
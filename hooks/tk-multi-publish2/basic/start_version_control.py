@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -165,33 +165,36 @@ class KritaStartVersionControlPlugin(HookBaseClass):
 
         :returns: True if item is valid, False otherwise.
         """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("start_version_control.validate"), tk_krita.watched(
+            "start_version_control.validate"
+        ):
+            publisher = self.parent
+            path = _session_path()
+
+            if not path:
+                # the session still requires saving. provide a save button.
+                # validation fails
+                error_msg = "The Krita session has not been saved."
+                self.logger.error(error_msg, extra=_get_save_as_action())
+                raise Exception(error_msg)
+
+            # NOTE: If the plugin is attached to an item, that means no version
+            # number could be found in the path. If that's the case, the work file
+            # template won't be much use here as it likely has a version number
+            # field defined within it. Simply use the path info hook to inject a
+            # version number into the current file path
+
+            # get the path to a versioned copy of the file.
+            version_path = publisher.util.get_version_path(path, "v001")
+            if os.path.exists(version_path):
+                error_msg = (
+                    "A file already exists with a version number. Please choose another name."
+                )
+                self.logger.error(error_msg, extra=_get_save_as_action())
+                raise Exception(error_msg)
 
-        publisher = self.parent
-        path = _session_path()
-
-        if not path:
-            # the session still requires saving. provide a save button.
-            # validation fails
-            error_msg = "The Krita session has not been saved."
-            self.logger.error(error_msg, extra=_get_save_as_action())
-            raise Exception(error_msg)
-
-        # NOTE: If the plugin is attached to an item, that means no version
-        # number could be found in the path. If that's the case, the work file
-        # template won't be much use here as it likely has a version number
-        # field defined within it. Simply use the path info hook to inject a
-        # version number into the current file path
-
-        # get the path to a versioned copy of the file.
-        version_path = publisher.util.get_version_path(path, "v001")
-        if os.path.exists(version_path):
-            error_msg = (
-                "A file already exists with a version number. Please choose another name."
-            )
-            self.logger.error(error_msg, extra=_get_save_as_action())
-            raise Exception(error_msg)
-
-        return True
+            return True
 
     def publish(self, settings, item):
         """
@@ -202,23 +205,26 @@ class KritaStartVersionControlPlugin(HookBaseClass):
             instances.
         :param item: Item to process
         """
+        tk_krita = self.parent.engine.import_module("tk_krita")
+        with tk_krita.profiled("start_version_control.publish"), tk_krita.watched(
+            "start_version_control.publish"
+        ):
+            publisher = self.parent
 
-        publisher = self.parent
-
-        # get the path in a normalized state. no trailing separator, separators
-        # are appropriate for current os, no double separators, etc.
-        path = sgtk.util.ShotgunPath.normalize(_session_path())
+            # get the path in a normalized state. no trailing separator, separators
+            # are appropriate for current os, no double separators, etc.
+            path = sgtk.util.ShotgunPath.normalize(_session_path())
 
-        # ensure the session is saved in its current state
-        _save_session(path)
+            # ensure the session is saved in its current state
+            _save_session(path)
 
-        # get the path to a versioned copy of the file.
-        version_path = publisher.util.get_version_path(path, "v001")
+            # get the path to a versioned copy of the file.
+            version_path = publisher.util.get_version_path(path, "v001")
 
-        # save to the new version path
-        _save_session(version_path)
-        self.logger.info("A version number has been added to the Krita file...")
-        self.logger.info("  Krita file path: %s" % (version_path,))
+            # save to the new version path
+            _save_session(version_path)
+            self.logger.info("A version number has been added to the Krita file...")
+            self.logger.info("  Krita file path: %s" % (version_path,))
 
     def finalize(self, settings, item):
         """
@@ -277,8 +283,8 @@ def _session_path():
     """
     path = None
 
-    krita_app = Krita.instance()
-    active_doc = krita_app.activeDocument()
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+    active_doc = tk_krita.active_document()
     if active_doc:
         path = active_doc.fileName()
 
@@ -294,10 +300,11 @@ def _save_session(path):
     folder = os.path.dirname(path)
     ensure_folder_exists(folder)
 
-    krita_app = Krita.instance()
-    active_doc = krita_app.activeDocument()
-    success = active_doc.saveAs(path)
-    active_doc.waitForDone()
+    tk_krita = sgtk.platform.current_engine().import_module("tk_krita")
+    active_doc = tk_krita.active_document()
+    with tk_krita.watched("save_session"):
+        success = active_doc.saveAs(path)
+        active_doc.waitForDone()
 
     if success:
         active_doc.setFileName(path)
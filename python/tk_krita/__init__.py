@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -11,3 +11,50 @@
 # ----------------------------------------------------------------------------
 
 from .menu_generation import MenuGenerator, can_create_menu
+from .document_tracker import ActiveDocumentTracker
+from .context_cache import ContextCache, get_config_key, normalize_path
+from .context_resolver import ContextResolver
+from .context_store import ContextStore, get_config_fingerprint, get_default_store_path
+from .timing import SpanRecorder, get_startup_recorder
+from .log_buffer import LogRingBuffer, LogEntry
+from .log_console import LogConsoleWidget
+from .json_log_sink import JsonLogSink, log_record_to_dict
+from .command_cache import CommandCache, get_app_key
+from .idle_scheduler import IdleCommandScheduler
+from .window_registry import WindowRegistry
+from .panel_lifecycle import PanelLifecycleManager
+from .stall_watchdog import StallWatchdog
+from .task_scheduler import TaskScheduler, Task, TaskCancelled
+from .compat_patches import PatchRegistry
+from .context_prewarmer import ContextPrewarmer
+from .metrics import MetricsRegistry, Counter, Gauge, Histogram
+from .memory_profiler import MemoryProfiler
+from .trace_recorder import TraceRecorder, get_trace_recorder
+from .bootstrap_snapshot import BootstrapSnapshot, get_launch_key
+from .document_events import (
+    DocumentEventBus,
+    DOCUMENT_EVENTS,
+    DOCUMENT_CREATED,
+    DOCUMENT_SAVED,
+    DOCUMENT_CLOSED,
+    VIEW_CREATED,
+    VIEW_CLOSED,
+    ACTIVE_VIEW_CHANGED,
+    WINDOW_CREATED,
+    WINDOW_CLOSED,
+    APPLICATION_CLOSING,
+)
+from .memory_budget import (
+    DocumentMemoryMonitor,
+    estimate_document_memory,
+    estimate_canvas_memory,
+    estimate_image_memory,
+)
+from .hook_utils import (
+    timed,
+    traced,
+    watched,
+    profiled,
+    active_document,
+    check_memory_budget,
+)
@@ -0,0 +1,157 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Snapshots of the context the engine started in, so the next launch of Krita
+with the same context and file can start the engine straight away in it,
+without resolving it again.
+
+Note that this module is also loaded by the startup code before the engine
+exists, so it should only depend on the standard library and tank.
+"""
+
+import os
+import json
+import time
+import hashlib
+
+import tank
+from tank.log import LogManager
+from tank.util import LocalFileStorageManager
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# bump this every time the way we store snapshots changes, snapshots with a
+# different schema version are ignored.
+SCHEMA_VERSION = 2
+
+# by default, snapshots older than a week are not used.
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+logger = LogManager.get_logger(__name__)
+
+
+def get_default_snapshot_folder():
+    """
+    Returns the folder the snapshots are kept in by default, in the toolkit
+    global cache folder.
+    """
+    cache_root = LocalFileStorageManager.get_global_root(LocalFileStorageManager.CACHE)
+    return os.path.join(cache_root, "tk-krita", "bootstrap")
+
+
+def get_launch_key(engine_name, context, file_to_open=None):
+    """
+    Returns a key that identifies a launch of Krita: the engine, the
+    pipeline configuration and context it was launched with and the file it
+    was asked to open, if any.
+    """
+    parts = [
+        engine_name,
+        context.sgtk.pipeline_configuration.get_path(),
+        json.dumps(context.to_dict(), sort_keys=True, default=str),
+        os.path.normcase(os.path.abspath(file_to_open)) if file_to_open else "",
+    ]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class BootstrapSnapshot(object):
+    """
+    The context the engine started in for a launch key, kept in a json file.
+
+    Every snapshot carries the schema version and the fingerprint of the
+    pipeline configuration it was taken with, so it is only used while both
+    are still the same.
+    """
+
+    def __init__(self, key, folder=None, max_age=DEFAULT_MAX_AGE):
+        """
+        :param key: Launch key, see get_launch_key.
+        :param folder: Folder of the snapshots. Defaults to the toolkit cache.
+        :param max_age: Time in seconds a snapshot is considered valid.
+        """
+        self.key = key
+        self._max_age = max_age
+        self.path = os.path.join(folder or get_default_snapshot_folder(), "%s.json" % key)
+
+    def load(self, fingerprint):
+        """
+        Returns the data of the snapshot, or None if there is no snapshot or
+        it is not valid anymore.
+        """
+        try:
+            with open(self.path) as snapshot_file:
+                data = json.load(snapshot_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if (
+            data.get("schema_version") != SCHEMA_VERSION
+            or data.get("fingerprint") != fingerprint
+            or data.get("created", 0) < time.time() - self._max_age
+        ):
+            return None
+
+        return data
+
+    def save(self, context, fingerprint):
+        """
+        Takes a snapshot of the given context, replacing the previous one.
+
+        Note that the user credentials are never written to disk.
+        """
+        data = {
+            "schema_version": SCHEMA_VERSION,
+            "fingerprint": fingerprint,
+            "created": time.time(),
+            "context": context.serialize(with_user_credentials=False),
+        }
+
+        tmp_path = "%s.%s.tmp" % (self.path, os.getpid())
+        try:
+            folder = os.path.dirname(self.path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+
+            with open(tmp_path, "w") as snapshot_file:
+                json.dump(data, snapshot_file, default=str)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as e:
+            logger.debug("Could not write the bootstrap snapshot '%s': %s", self.path, e)
+
+    def invalidate(self):
+        """
+        Removes the snapshot.
+        """
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def get_context(self, fingerprint):
+        """
+        Returns the context of the snapshot, or None if there is no valid
+        snapshot.
+        """
+        data = self.load(fingerprint)
+        if data is None:
+            return None
+
+        try:
+            return tank.context.deserialize(data["context"])
+        except Exception as e:
+            logger.debug("Could not restore the bootstrap snapshot '%s': %s", self.path, e)
+            self.invalidate()
+            return None
@@ -0,0 +1,180 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Cache of the commands registered by every app, shared between Krita
+sessions, so the menu can be built before the apps are initialized.
+
+"""
+
+import os
+import json
+import hashlib
+
+from tank.log import LogManager
+from tank.util import LocalFileStorageManager
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# bump this every time the way we store commands changes, caches written with
+# a different version are ignored.
+SCHEMA_VERSION = 1
+
+# properties of the commands that are either set by the engine when the
+# command is registered or only make sense once the app is initialized.
+EXCLUDED_PROPERTIES = ("app", "prefix")
+
+logger = LogManager.get_logger(__name__)
+
+
+def get_default_cache_path():
+    """
+    Returns the path of the cache file used by default, in the toolkit global
+    cache folder.
+    """
+    cache_root = LocalFileStorageManager.get_global_root(LocalFileStorageManager.CACHE)
+    return os.path.join(cache_root, "tk-krita", "command_cache.json")
+
+
+def get_app_key(app, environment_name, context):
+    """
+    Returns the key that identifies the commands of an app instance.
+
+    Apps can register different commands depending on their settings and
+    the kind of context they are initialized in, so both are part of the
+    key along with the app version.
+    """
+    settings = json.dumps(app.settings, sort_keys=True, default=str)
+    context_shape = "%s|%s|%s" % (
+        (context.entity or {}).get("type"),
+        bool(context.step),
+        bool(context.task),
+    )
+    return "%s|%s|%s|%s" % (
+        environment_name,
+        app.instance_name,
+        app.version,
+        hashlib.sha1((settings + context_shape).encode("utf-8")).hexdigest(),
+    )
+
+
+def serialize_command(name, properties):
+    """
+    Returns a json serializable dictionary of a command, skipping the
+    properties that cannot be stored, ie. callbacks.
+    """
+    stored_properties = {}
+    for (key, value) in properties.items():
+        if key in EXCLUDED_PROPERTIES or callable(value):
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        stored_properties[key] = value
+
+    return {"name": name, "properties": stored_properties}
+
+
+class CommandCache(object):
+    """
+    Json file of app key -> list of commands the app registered the last
+    time it was initialized.
+
+    The whole cache is discarded if the pipeline configuration fingerprint
+    changes.
+    """
+
+    def __init__(self, fingerprint, path=None):
+        """
+        :param fingerprint: Fingerprint of the pipeline configuration.
+        :param path: Path of the cache file. Defaults to a file in the
+                     toolkit global cache folder.
+        """
+        self._fingerprint = fingerprint
+        self._path = path or get_default_cache_path()
+        self._apps = {}
+        self._modified = False
+
+        self._load()
+
+    @property
+    def path(self):
+        """
+        Path of the cache file.
+        """
+        return self._path
+
+    def get(self, key):
+        """
+        Returns the list of commands cached for the given app key or None if
+        the app was never initialized with this key.
+        """
+        return self._apps.get(key)
+
+    def set(self, key, commands):
+        """
+        Caches the commands of an app. Commands are given as a list of
+        (name, properties) tuples.
+        """
+        serialized_commands = [serialize_command(name, props) for (name, props) in commands]
+        if self._apps.get(key) != serialized_commands:
+            self._apps[key] = serialized_commands
+            self._modified = True
+
+    def save(self):
+        """
+        Writes the cache to disk if it was modified.
+        """
+        if not self._modified:
+            return
+
+        data = {"schema": SCHEMA_VERSION, "fingerprint": self._fingerprint, "apps": self._apps}
+
+        try:
+            folder = os.path.dirname(self._path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+
+            # write to a temporary file first so other Krita sessions never
+            # read a partially written cache.
+            tmp_path = "%s.%s.tmp" % (self._path, os.getpid())
+            with open(tmp_path, "w") as cache_file:
+                json.dump(data, cache_file)
+            os.replace(tmp_path, self._path)
+            self._modified = False
+        except (IOError, OSError) as e:
+            logger.debug("Could not write the command cache %s: %s", self._path, e)
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path, "r") as cache_file:
+                data = json.load(cache_file)
+        except (IOError, OSError, ValueError) as e:
+            logger.debug("Could not read the command cache %s: %s", self._path, e)
+            return
+
+        if (
+            data.get("schema") != SCHEMA_VERSION
+            or data.get("fingerprint") != self._fingerprint
+        ):
+            logger.debug("Discarding command cache %s, configuration changed.", self._path)
+            self._modified = True
+            return
+
+        self._apps = data.get("apps", {})
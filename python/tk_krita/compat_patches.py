@@ -0,0 +1,205 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Compatibility patches for the tk apps modules that do not work as is with
+PyQt5.
+
+Patches are applied by an import hook, the moment the module they target is
+imported, so there is no need to go through all the loaded modules looking
+for them. To add a new one, write a function that receives the module and
+add it to PATCHES along with a regular expression matching the module name.
+"""
+
+import re
+import sys
+import importlib.abc
+
+from tank.log import LogManager
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+logger = LogManager.get_logger(__name__)
+
+
+# TBR: DGH290420
+# This is an interesting one. It is the only way I found I could fix the
+# python console. Other ideas are welcomed. I could have gone the deeper
+# route introspecting engine.apps but this ultimately felt simpler.
+# the main issue is that PyQt5 behaves differently when returning from a
+# keyPressEvent. While in PySide(2) the accepted behaviour is to return True
+# or False to indicate that we want to propagate the event, in PyQt5 seems
+# that a simple return indicates no propagation, whereas if we want to propagate
+# the event we should simply pass it on to our parent class. I could be wrong
+# in this as a general PyQt5 rule, but that is what I experienced.
+def patch_pythonconsole_tab_widget(module):
+    """
+    tk-multi-pythonconsole: PyQt5 compatible hotkeys for the tabs.
+    """
+    PythonTabWidget = getattr(module, "PythonTabWidget", None)
+    if PythonTabWidget is None:
+        # some other app with an app.console module
+        return
+
+    QtCore = module.QtCore
+
+    def keyPressEvent(self, event):
+        """
+        Adds support for tab creation and navigation via hotkeys.
+        """
+
+        if bool(QtCore.Qt.ControlModifier & event.modifiers()):
+            # Ctrl+T to add a new tab
+            if event.key() == QtCore.Qt.Key_T:
+                self.add_tab()
+                return
+
+            # Ctrl+Shift+[ or Ctrl+Shift+] to navigate tabs
+            if bool(QtCore.Qt.ShiftModifier & event.modifiers()):
+                if event.key() in [QtCore.Qt.Key_BraceLeft]:
+                    self.goto_tab(-1)
+                elif event.key() in [QtCore.Qt.Key_BraceRight]:
+                    self.goto_tab(1)
+
+        return super(PythonTabWidget, self).keyPressEvent(event)
+
+    PythonTabWidget.keyPressEvent = keyPressEvent
+
+
+# (name, regular expression matching the module name, patch function)
+# tk-core imports the apps python modules under a unique name, ie.
+# tkimp123..._tk_multi_pythonconsole.app.console, so expressions should only
+# rely on the end of the name.
+PATCHES = [
+    ("tk-multi-pythonconsole tab hotkeys", r"app\.console$", patch_pythonconsole_tab_widget),
+]
+
+
+class _PatchingLoader(importlib.abc.Loader):
+    """
+    Loader that patches the module once the original loader executed it.
+    """
+
+    def __init__(self, loader, registry):
+        self._loader = loader
+        self._registry = registry
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._loader.exec_module(module)
+        self._registry.apply(module)
+
+    def __getattr__(self, name):
+        # ie. get_source, is_package...
+        return getattr(self._loader, name)
+
+
+class PatchRegistry(importlib.abc.MetaPathFinder):
+    """
+    Import hook applying the compatibility patches to the modules they
+    target as they are imported.
+    """
+
+    # lets us find the hooks installed by previous engine instances, whose
+    # classes are not ours since our modules are imported again every time.
+    IS_TK_KRITA_PATCH_REGISTRY = True
+
+    def __init__(self, patches=None):
+        self._patches = [
+            (name, re.compile(expression), fn)
+            for (name, expression, fn) in (PATCHES if patches is None else patches)
+        ]
+        self._finding = set()
+
+        # names of the modules already patched
+        self.applied = set()
+
+    def install(self):
+        """
+        Adds the import hook, replacing the one from a previous engine, and
+        patches the modules that were already imported.
+        """
+        sys.meta_path[:] = [
+            finder
+            for finder in sys.meta_path
+            if not getattr(finder, "IS_TK_KRITA_PATCH_REGISTRY", False)
+        ]
+        sys.meta_path.insert(0, self)
+
+        # the only time we go through the loaded modules
+        for (module_name, module) in list(sys.modules.items()):
+            if module is not None and self._get_patches(module_name):
+                self.apply(module)
+
+    def uninstall(self):
+        """
+        Removes the import hook.
+        """
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def apply(self, module):
+        """
+        Applies the patches targeting the given module, once.
+        """
+        module_name = module.__name__
+        if module_name in self.applied:
+            return
+
+        for (name, fn) in self._get_patches(module_name):
+            try:
+                fn(module)
+                logger.debug("Applied compatibility patch '%s' to %s", name, module_name)
+            except Exception:
+                logger.warning(
+                    "Could not apply compatibility patch '%s' to %s", name, module_name
+                )
+        self.applied.add(module_name)
+
+    def _get_patches(self, module_name):
+        return [
+            (name, fn)
+            for (name, expression, fn) in self._patches
+            if expression.search(module_name)
+        ]
+
+    def find_spec(self, fullname, path, target=None):
+        """
+        Lets the other finders find the module and wraps its loader if the
+        module needs to be patched.
+        """
+        if fullname in self._finding or not self._get_patches(fullname):
+            return None
+
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(fullname)
+
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+
+        spec.loader = _PatchingLoader(spec.loader, self)
+        return spec
@@ -0,0 +1,174 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+In memory cache of the toolkit instance and context resolved for a path.
+
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+def normalize_path(path):
+    """
+    Returns the path in a form that can be used to compare paths.
+    """
+    return os.path.normcase(os.path.abspath(path))
+
+
+def get_config_key(tk):
+    """
+    Returns a key that identifies the pipeline configuration used by the
+    given toolkit instance.
+    """
+    pipeline_config = tk.pipeline_configuration
+    return (pipeline_config.get_path(), pipeline_config.get_shotgun_id())
+
+
+class ContextCache(object):
+    """
+    Bounded LRU cache of path -> (tk, context).
+
+    Entries are only valid for the pipeline configuration they were resolved
+    with and for a limited amount of time. Changing the pipeline configuration
+    empties the cache completely.
+    """
+
+    def __init__(self, max_size=32, ttl=600):
+        """
+        :param max_size: Maximum number of entries kept in the cache. A size of
+                         0 disables the cache.
+        :param ttl: Time in seconds an entry is considered valid.
+        """
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._config_key = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_config(self, config_key):
+        """
+        Empty the cache if the pipeline configuration has changed.
+        """
+        if config_key != self._config_key:
+            self._entries.clear()
+            self._config_key = config_key
+
+    def get(self, path, config_key):
+        """
+        Returns the cached (tk, context) for the given path or None if not
+        found or expired.
+
+        :param path: Path of the document.
+        :param config_key: Key of the current pipeline configuration as
+                           returned by :meth:`get_config_key`.
+        """
+        key = normalize_path(path)
+
+        with self._lock:
+            self._check_config(config_key)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            timestamp, value = entry
+            if time.monotonic() - timestamp > self._ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def contains(self, path, config_key):
+        """
+        Returns True if a context that has not expired is cached for the
+        given path. Unlike :meth:`get`, it does not count as a lookup nor
+        makes the entry more recent.
+        """
+        key = normalize_path(path)
+
+        with self._lock:
+            self._check_config(config_key)
+
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry[0] <= self._ttl
+
+    def set(self, path, config_key, tk, context):
+        """
+        Stores the toolkit instance and context resolved for the given path.
+        """
+        if self._max_size <= 0:
+            return
+
+        key = normalize_path(path)
+
+        with self._lock:
+            self._check_config(config_key)
+
+            self._entries[key] = (time.monotonic(), (tk, context))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, path):
+        """
+        Forgets about the given path.
+        """
+        with self._lock:
+            self._entries.pop(normalize_path(path), None)
+
+    def clear(self):
+        """
+        Forgets about all the paths.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary with the statistics of the cache, useful to tune
+        its size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl": self._ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,164 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Resolution, ahead of time, of the contexts of the documents opened in Krita.
+
+"""
+
+import os
+
+import krita
+
+from tank.platform.qt import QtCore
+
+from . import document_events
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# time in milliseconds without documents being opened or saved before we
+# start resolving their contexts.
+IDLE_DELAY = 2000
+
+
+class ContextPrewarmer(QtCore.QObject):
+    """
+    Once Krita has been idle for a while, resolves the context of every saved
+    document that is not cached yet, one at a time in the resolver worker
+    thread, so switching to any opened document finds its context in the
+    cache.
+    """
+
+    def __init__(
+        self,
+        resolver,
+        event_bus,
+        is_cached_fn,
+        resolved_fn,
+        context_fn,
+        interval=IDLE_DELAY,
+        parent=None,
+    ):
+        """
+        :param resolver: ContextResolver used to resolve the contexts. It
+                         should not be the one used for the active document,
+                         since a new request drops the previous one.
+        :param event_bus: DocumentEventBus telling us when documents are
+                          opened or saved.
+        :param is_cached_fn: Function returning True if the context of the
+                             given path is already cached.
+        :param resolved_fn: Function called with the path and the resolved
+                            (tk, context) tuple.
+        :param context_fn: Function returning the current context of the
+                           engine.
+        :param interval: Time in milliseconds to wait for Krita to be idle.
+        """
+        super(ContextPrewarmer, self).__init__(parent)
+
+        self._resolver = resolver
+        self._event_bus = event_bus
+        self._is_cached_fn = is_cached_fn
+        self._resolved_fn = resolved_fn
+        self._context_fn = context_fn
+
+        self._pending_paths = []
+        self._resolving = False
+        self._started = False
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._on_idle)
+
+        self.prewarmed_count = 0
+
+    def start(self):
+        """
+        Start resolving the contexts of the opened documents, now and every
+        time documents are opened or saved.
+        """
+        if self._started:
+            return
+
+        self._started = True
+
+        self._event_bus.subscribe(document_events.DOCUMENT_CREATED, self.schedule)
+        self._event_bus.subscribe(document_events.DOCUMENT_SAVED, self.schedule)
+
+        self.schedule()
+
+    def stop(self):
+        """
+        Stop resolving contexts.
+        """
+        if not self._started:
+            return
+
+        self._started = False
+        self._timer.stop()
+        self._pending_paths = []
+        self._resolver.stop()
+        self._resolving = False
+
+        self._event_bus.unsubscribe(document_events.DOCUMENT_CREATED, self.schedule)
+        self._event_bus.unsubscribe(document_events.DOCUMENT_SAVED, self.schedule)
+
+    def schedule(self, *_):
+        """
+        (Re)start waiting for Krita to be idle.
+        """
+        if self._started:
+            self._timer.start()
+
+    def _on_idle(self):
+        """
+        Looks for the opened documents whose context is not cached yet.
+        """
+        known_paths = set(self._pending_paths)
+        for document in krita.Krita.instance().documents():
+            path = document.fileName()
+            if not path:
+                # not saved yet
+                continue
+
+            path = os.path.abspath(path)
+            if path not in known_paths and not self._is_cached_fn(path):
+                self._pending_paths.append(path)
+                known_paths.add(path)
+
+        self._resolve_next()
+
+    def _resolve_next(self):
+        if self._resolving or not self._pending_paths or not self._started:
+            return
+
+        path = self._pending_paths.pop(0)
+        if self._is_cached_fn(path):
+            # resolved for the active document in the meantime
+            self._resolve_next()
+            return
+
+        self._resolving = True
+        self._resolver.request(path, self._context_fn(), self._on_resolved)
+
+    def _on_resolved(self, path, result, error):
+        self._resolving = False
+
+        if error is None:
+            self._resolved_fn(path, result)
+            self.prewarmed_count += 1
+
+        # give Krita a chance to process its events between documents
+        QtCore.QTimer.singleShot(0, self._resolve_next)
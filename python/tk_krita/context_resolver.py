@@ -0,0 +1,148 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Resolution of the context of a document in a worker thread.
+
+"""
+
+import threading
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+class ContextResolver(object):
+    """
+    Runs the (potentially slow) resolution of the context of a path in a
+    worker thread so Krita is not blocked while toolkit talks to the
+    filesystem and Shotgun.
+
+    Only the latest request matters: a request made while another one is
+    still being resolved makes the result of the older one to be dropped.
+    """
+
+    def __init__(self, resolve_fn, main_thread_fn, logger):
+        """
+        :param resolve_fn: Function called in the worker thread with the path
+                           and the current context. Should return the
+                           resolved (tk, context) tuple.
+        :param main_thread_fn: Function used to run the callbacks in the main
+                               thread, ie. engine.async_execute_in_main_thread
+        :param logger: Logger to use.
+        """
+        self._resolve_fn = resolve_fn
+        self._main_thread_fn = main_thread_fn
+        self._logger = logger
+
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._request = None
+        self._thread = None
+
+        self.resolved_count = 0
+        self.dropped_count = 0
+
+    def request(self, path, current_context, callback):
+        """
+        Resolve the context of the given path in the worker thread.
+
+        Once resolved, callback(path, result, error) is called in the main
+        thread, where result is the (tk, context) tuple and error the
+        exception raised while resolving it, if any.
+
+        :returns: The generation of the request.
+        """
+        with self._condition:
+            self._generation += 1
+            self._request = (self._generation, path, current_context, callback)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="tk-krita context resolver"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self):
+        """
+        Forget about any pending request, its result will be dropped.
+        """
+        with self._condition:
+            self._generation += 1
+            self._request = None
+
+    def stop(self):
+        """
+        Cancel any pending request and stop the worker thread.
+        """
+        with self._condition:
+            self._generation += 1
+            self._request = None
+            self._thread = None
+            self._condition.notify_all()
+
+    def is_current(self, generation):
+        """
+        Returns True if the given request generation is the latest one.
+        """
+        with self._condition:
+            return generation == self._generation
+
+    def _run(self):
+        """
+        Worker thread loop.
+        """
+        this_thread = threading.current_thread()
+        while True:
+            with self._condition:
+                while self._request is None and self._thread is this_thread:
+                    self._condition.wait()
+
+                # stop() was called, a new thread will be created if needed
+                if self._thread is not this_thread:
+                    return
+
+                generation, path, current_context, callback = self._request
+                self._request = None
+
+            result = None
+            error = None
+            try:
+                result = self._resolve_fn(path, current_context)
+            except Exception as e:
+                error = e
+
+            if self.is_current(generation):
+                self._main_thread_fn(self._deliver, generation, path, result, error, callback)
+            else:
+                self._drop(path)
+
+    def _deliver(self, generation, path, result, error, callback):
+        """
+        Runs in the main thread. Calls the callback unless a newer request
+        was made in the meantime.
+        """
+        if not self.is_current(generation):
+            self._drop(path)
+            return
+
+        self.resolved_count += 1
+        callback(path, result, error)
+
+    def _drop(self, path):
+        self.dropped_count += 1
+        self._logger.debug("Dropping stale context resolved for path: '%s'", path)
@@ -0,0 +1,248 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Persistent cache of the contexts resolved for the documents paths, shared
+between Krita sessions.
+
+Note that this module is also loaded by the startup code before the engine
+exists, so it should only depend on the standard library and tank.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+
+import tank
+from tank.log import LogManager
+from tank.util import LocalFileStorageManager
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# bump this every time the way we store contexts changes, entries stored with
+# a different schema version are ignored and purged.
+SCHEMA_VERSION = 1
+
+# files of the pipeline configuration that affect how a path is resolved into
+# a context. If any of them changes, the stored contexts are not valid anymore.
+CONFIG_FILES = (os.path.join("core", "templates.yml"), os.path.join("core", "roots.yml"))
+
+# by default, contexts older than a week are resolved again.
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+logger = LogManager.get_logger(__name__)
+
+
+def get_default_store_path():
+    """
+    Returns the path of the database used by default, in the toolkit global
+    cache folder.
+    """
+    cache_root = LocalFileStorageManager.get_global_root(LocalFileStorageManager.CACHE)
+    return os.path.join(cache_root, "tk-krita", "context_cache.db")
+
+
+def get_config_fingerprint(tk):
+    """
+    Returns a fingerprint of the pipeline configuration used by the given
+    toolkit instance. It changes if a different configuration is used or the
+    files that drive the path resolution are modified.
+    """
+    pipeline_config = tk.pipeline_configuration
+    config_location = pipeline_config.get_config_location()
+
+    parts = [pipeline_config.get_path(), str(pipeline_config.get_shotgun_id())]
+    for config_file in CONFIG_FILES:
+        config_file_path = os.path.join(config_location, config_file)
+        try:
+            parts.append("%s:%s" % (config_file, os.path.getmtime(config_file_path)))
+        except OSError:
+            parts.append("%s:missing" % config_file)
+
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class ContextStore(object):
+    """
+    SQLite backed cache of document path -> serialized context.
+
+    Every entry carries the schema version and the fingerprint of the pipeline
+    configuration it was resolved with, so it is only used while both are
+    still the same.
+
+    A new connection is opened for every operation so the store can be used
+    from any thread, and by several Krita sessions at the same time.
+    """
+
+    def __init__(self, path=None, max_age=DEFAULT_MAX_AGE):
+        """
+        :param path: Path of the database file. Defaults to the toolkit cache.
+        :param max_age: Time in seconds a stored context is considered valid.
+        """
+        self._path = path or get_default_store_path()
+        self._max_age = max_age
+        self._initialized = False
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self):
+        """
+        Path of the database file.
+        """
+        return self._path
+
+    def _connect(self):
+        """
+        Returns a new connection to the database, creating it if needed.
+        """
+        if not self._initialized:
+            folder = os.path.dirname(self._path)
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+
+        connection = sqlite3.connect(self._path, timeout=5)
+
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS contexts ("
+                "path TEXT PRIMARY KEY, "
+                "schema_version INTEGER, "
+                "fingerprint TEXT, "
+                "created REAL, "
+                "context TEXT)"
+            )
+            connection.execute(
+                "DELETE FROM contexts WHERE schema_version != ? OR created < ?",
+                (SCHEMA_VERSION, time.time() - self._max_age),
+            )
+            connection.commit()
+            self._initialized = True
+
+        return connection
+
+    def _get_entry(self, path):
+        """
+        Returns the (fingerprint, serialized context) stored for the given
+        path or None if not found or too old.
+        """
+        key = os.path.normcase(os.path.abspath(path))
+
+        try:
+            connection = self._connect()
+            try:
+                return connection.execute(
+                    "SELECT fingerprint, context FROM contexts "
+                    "WHERE path = ? AND schema_version = ? AND created >= ?",
+                    (key, SCHEMA_VERSION, time.time() - self._max_age),
+                ).fetchone()
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.debug("Could not read from the context store '%s': %s", self._path, e)
+            return None
+
+    def get(self, path, fingerprint):
+        """
+        Returns the serialized context stored for the given path or None if
+        not found or not valid anymore.
+        """
+        entry = self._get_entry(path)
+        if entry is None or entry[0] != fingerprint:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry[1]
+
+    def set(self, path, fingerprint, serialized_context):
+        """
+        Stores the serialized context for the given path.
+        """
+        key = os.path.normcase(os.path.abspath(path))
+
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO contexts "
+                    "(path, schema_version, fingerprint, created, context) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, SCHEMA_VERSION, fingerprint, time.time(), serialized_context),
+                )
+                connection.commit()
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.debug("Could not write to the context store '%s': %s", self._path, e)
+
+    def invalidate(self, path):
+        """
+        Forgets about the given path.
+        """
+        key = os.path.normcase(os.path.abspath(path))
+
+        try:
+            connection = self._connect()
+            try:
+                connection.execute("DELETE FROM contexts WHERE path = ?", (key,))
+                connection.commit()
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.debug("Could not write to the context store '%s': %s", self._path, e)
+
+    def get_context(self, path):
+        """
+        Returns the context stored for the given path, as long as the pipeline
+        configuration of its project has not changed since it was resolved,
+        or None.
+
+        The path could belong to any project, so the fingerprint is checked
+        against the toolkit instance the context is restored with.
+        """
+        entry = self._get_entry(path)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        fingerprint, serialized_context = entry
+        try:
+            context = tank.context.deserialize(serialized_context)
+            valid = get_config_fingerprint(context.sgtk) == fingerprint
+        except Exception as e:
+            logger.debug("Could not deserialize the stored context for '%s': %s", path, e)
+            context, valid = None, False
+
+        if not valid:
+            self.misses += 1
+            self.invalidate(path)
+            return None
+
+        self.hits += 1
+        return context
+
+    def set_context(self, path, context):
+        """
+        Stores the context resolved for the given path, along with the
+        fingerprint of the pipeline configuration of its own project.
+
+        Note that the user credentials are never written to disk.
+        """
+        serialized_context = context.serialize(with_user_credentials=False)
+        self.set(path, get_config_fingerprint(context.sgtk), serialized_context)
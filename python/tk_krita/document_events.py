@@ -0,0 +1,229 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Single point of connection to the Krita document, view and window signals.
+
+The engine, its caches and the hooks subscribe to the events they care about
+instead of connecting to the Krita Notifier themselves or querying Krita over
+and over:
+
+    engine.document_events.subscribe(tk_krita.DOCUMENT_SAVED, on_saved)
+
+Note that Krita does not let python know when a document is modified, so
+there is no event for it.
+"""
+
+import os
+
+import krita
+
+from tank.platform.qt import QtCore
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# events and the arguments their subscribers are called with
+DOCUMENT_CREATED = "document_created"  # (document)
+DOCUMENT_SAVED = "document_saved"  # (path)
+DOCUMENT_CLOSED = "document_closed"  # (path)
+VIEW_CREATED = "view_created"  # (view)
+VIEW_CLOSED = "view_closed"  # (view)
+ACTIVE_VIEW_CHANGED = "active_view_changed"  # ()
+WINDOW_CREATED = "window_created"  # ()
+WINDOW_CLOSED = "window_closed"  # ()
+APPLICATION_CLOSING = "application_closing"  # ()
+
+DOCUMENT_EVENTS = (
+    DOCUMENT_CREATED,
+    DOCUMENT_SAVED,
+    DOCUMENT_CLOSED,
+    VIEW_CREATED,
+    VIEW_CLOSED,
+    ACTIVE_VIEW_CHANGED,
+    WINDOW_CREATED,
+    WINDOW_CLOSED,
+    APPLICATION_CLOSING,
+)
+
+
+class DocumentEventBus(QtCore.QObject):
+    """
+    Listens to the Krita Notifier and to the active view signals of every
+    window, and calls the subscribers of each event in the order they
+    subscribed.
+
+    A subscriber raising an exception is logged and does not prevent the
+    other subscribers from being called.
+    """
+
+    def __init__(self, logger, parent=None):
+        super(DocumentEventBus, self).__init__(parent)
+
+        self._logger = logger
+        self._subscribers = dict((event, []) for event in DOCUMENT_EVENTS)
+        self._windows = []
+        self._started = False
+
+        # how many times every event was emitted, useful to know how busy
+        # the subscribers are kept.
+        self.emitted_counts = dict((event, 0) for event in DOCUMENT_EVENTS)
+
+    @property
+    def is_started(self):
+        """
+        Returns True if the bus is listening to the Krita events.
+        """
+        return self._started
+
+    def subscribe(self, event, callback):
+        """
+        Calls the given callback every time the event happens, see
+        DOCUMENT_EVENTS.
+        """
+        if event not in self._subscribers:
+            raise ValueError("Unknown document event '%s'." % event)
+
+        if callback not in self._subscribers[event]:
+            self._subscribers[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        """
+        Stops calling the given callback for the event, if it was subscribed.
+        """
+        try:
+            self._subscribers[event].remove(callback)
+        except (KeyError, ValueError):
+            pass
+
+    def emit(self, event, *args):
+        """
+        Calls the subscribers of the event with the given arguments.
+        """
+        self.emitted_counts[event] += 1
+
+        # subscribers might unsubscribe while we go through them
+        for callback in list(self._subscribers[event]):
+            try:
+                callback(*args)
+            except Exception:
+                self._logger.exception("Error handling the document event '%s':", event)
+
+    def start(self):
+        """
+        Start listening to the Krita events.
+        """
+        if self._started:
+            return
+
+        self._started = True
+
+        notifier = krita.Krita.instance().notifier()
+        notifier.setActive(True)
+        for signal, slot in self._notifier_connections(notifier):
+            signal.connect(slot)
+
+        self._connect_windows()
+
+    def stop(self):
+        """
+        Stop listening to the Krita events. Subscribers are kept, so the bus
+        can be started again.
+        """
+        if not self._started:
+            return
+
+        self._started = False
+
+        notifier = krita.Krita.instance().notifier()
+        for signal, slot in self._notifier_connections(notifier):
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                # was not connected
+                pass
+
+        for window in self._windows:
+            for signal, slot in (
+                (window.activeViewChanged, self._on_active_view_changed),
+                (window.windowClosed, self._on_window_closed),
+            ):
+                try:
+                    signal.disconnect(slot)
+                except (TypeError, RuntimeError):
+                    # not connected or the window is already gone
+                    pass
+
+        self._windows = []
+
+    def _notifier_connections(self, notifier):
+        return (
+            (notifier.imageCreated, self._on_image_created),
+            (notifier.imageSaved, self._on_image_saved),
+            (notifier.imageClosed, self._on_image_closed),
+            (notifier.viewCreated, self._on_view_created),
+            (notifier.viewClosed, self._on_view_closed),
+            (notifier.windowCreated, self._on_window_created),
+            (notifier.applicationClosing, self._on_application_closing),
+        )
+
+    def _connect_windows(self):
+        """
+        Connect to the active view signal of the windows we are not listening
+        to yet.
+        Note that we keep a reference to the Window python objects, otherwise
+        they are garbage collected along with our connections.
+        """
+        known_qwindows = [window.qwindow() for window in self._windows]
+        for window in krita.Krita.instance().windows():
+            if window.qwindow() not in known_qwindows:
+                window.activeViewChanged.connect(self._on_active_view_changed)
+                window.windowClosed.connect(self._on_window_closed)
+                self._windows.append(window)
+
+    def _on_image_created(self, document):
+        self.emit(DOCUMENT_CREATED, document)
+
+    def _on_image_saved(self, path):
+        self.emit(DOCUMENT_SAVED, os.path.abspath(path))
+
+    def _on_image_closed(self, path):
+        self.emit(DOCUMENT_CLOSED, os.path.abspath(path) if path else path)
+
+    def _on_view_created(self, view):
+        self.emit(VIEW_CREATED, view)
+
+    def _on_view_closed(self, view):
+        self.emit(VIEW_CLOSED, view)
+
+    def _on_active_view_changed(self):
+        self.emit(ACTIVE_VIEW_CHANGED)
+
+    def _on_window_created(self):
+        """
+        A new window was created, make sure we listen to its views.
+        """
+        self._connect_windows()
+        self.emit(WINDOW_CREATED)
+
+    def _on_window_closed(self):
+        """
+        A window was closed, forget about it.
+        """
+        qwindows = [window.qwindow() for window in krita.Krita.instance().windows()]
+        self._windows = [window for window in self._windows if window.qwindow() in qwindows]
+        self.emit(WINDOW_CLOSED)
+
+    def _on_application_closing(self):
+        self.emit(APPLICATION_CLOSING)
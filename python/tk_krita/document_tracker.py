@@ -0,0 +1,134 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Event driven tracking of the active document in Krita.
+
+"""
+
+import krita
+
+from tank.platform.qt import QtCore
+
+from . import document_events
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# time in milliseconds we wait for the document events to settle down before
+# we check if the active document really changed.
+DEBOUNCE_INTERVAL = 150
+
+# events that could change the active document
+ACTIVE_DOCUMENT_EVENTS = (
+    document_events.DOCUMENT_CREATED,
+    document_events.DOCUMENT_CLOSED,
+    document_events.VIEW_CREATED,
+    document_events.VIEW_CLOSED,
+    document_events.ACTIVE_VIEW_CHANGED,
+    document_events.WINDOW_CREATED,
+    document_events.WINDOW_CLOSED,
+)
+
+
+class ActiveDocumentTracker(QtCore.QObject):
+    """
+    Watches the document events that could change the active document, see
+    DocumentEventBus, and calls the given callback once it has changed.
+
+    Bursts of events, ie. when the artist is quickly going through the tabs of
+    the opened documents, are coalesced into a single call to the callback.
+    """
+
+    def __init__(self, callback, event_bus, interval=DEBOUNCE_INTERVAL, parent=None):
+        super(ActiveDocumentTracker, self).__init__(parent)
+
+        self._callback = callback
+        self._event_bus = event_bus
+        self._active_doc = None
+        self._started = False
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._on_timeout)
+
+        # how many times the callback was called versus how many events did
+        # not end up calling it, either because they were coalesced with
+        # other events or because the active document did not change.
+        self.triggered_count = 0
+        self.suppressed_count = 0
+
+    @property
+    def is_started(self):
+        """
+        Returns True if the tracker is listening to the Krita events.
+        """
+        return self._started
+
+    def start(self):
+        """
+        Start listening to the Krita events that could change the active
+        document.
+        """
+        if self._started:
+            return
+
+        self._started = True
+
+        # we only want to know about document changes from now on
+        self._active_doc = krita.Krita.instance().activeDocument()
+
+        for event in ACTIVE_DOCUMENT_EVENTS:
+            self._event_bus.subscribe(event, self._on_document_event)
+
+    def stop(self):
+        """
+        Stop listening to the Krita events.
+        """
+        if not self._started:
+            return
+
+        self._started = False
+        self._timer.stop()
+
+        for event in ACTIVE_DOCUMENT_EVENTS:
+            self._event_bus.unsubscribe(event, self._on_document_event)
+
+    def _on_document_event(self, *_):
+        """
+        Something happened that could have changed the active document.
+        (Re)start the timer so consecutive events end up in a single check.
+        """
+        if not self._started:
+            return
+
+        if self._timer.isActive():
+            self.suppressed_count += 1
+
+        self._timer.start()
+
+    def _on_timeout(self):
+        """
+        Events have settled down, call the callback if the active document
+        is not the same one we saw the last time.
+        """
+        active_doc = krita.Krita.instance().activeDocument()
+        if active_doc == self._active_doc:
+            self.suppressed_count += 1
+            return
+
+        self._active_doc = active_doc
+        self.triggered_count += 1
+        self._callback()
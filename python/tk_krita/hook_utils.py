@@ -0,0 +1,122 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Helpers shared by the Krita hooks of the tk apps, so they do not need to
+know which features of the engine are enabled:
+
+    tk_krita = self.parent.engine.import_module("tk_krita")
+    with tk_krita.timed("tk_krita_export_layer_seconds"):
+        node.save(...)
+"""
+
+import contextlib
+
+import krita
+
+import tank
+
+from .memory_budget import estimate_canvas_memory
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+@contextlib.contextmanager
+def timed(metric_name):
+    """
+    A handy context for recording the time spent in the engine metrics, if
+    the engine has them.
+    """
+    metrics = getattr(tank.platform.current_engine(), "metrics", None)
+    if metrics is None:
+        yield
+        return
+
+    with metrics.timer(metric_name):
+        yield
+
+
+@contextlib.contextmanager
+def traced(name, **args):
+    """
+    A handy context for recording an operation in the trace of the engine
+    activity, when it is being recorded.
+    """
+    trace_recorder = getattr(tank.platform.current_engine(), "trace_recorder", None)
+    if trace_recorder is None:
+        yield
+        return
+
+    with trace_recorder.span(name, "hook", **args):
+        yield
+
+
+@contextlib.contextmanager
+def watched(name):
+    """
+    A handy context for marking an operation that can block Krita, so the
+    stall watchdog of the engine reports it if it does.
+    """
+    stall_watchdog = getattr(tank.platform.current_engine(), "stall_watchdog", None)
+    if stall_watchdog is None:
+        yield
+        return
+
+    with stall_watchdog.operation(name):
+        yield
+
+
+@contextlib.contextmanager
+def profiled(operation):
+    """
+    A handy context for tracing an operation and profiling the memory it
+    uses, when the engine does so.
+    """
+    memory_profiler = getattr(tank.platform.current_engine(), "memory_profiler", None)
+    with traced(operation):
+        if memory_profiler is None:
+            yield
+        else:
+            with memory_profiler.profile(operation):
+                yield
+
+
+def active_document():
+    """
+    Return the active document. When running headless, ie. in a render farm,
+    there are no views to make a document active, so the last document
+    opened is used instead.
+    """
+    krita_app = krita.Krita.instance()
+    active_doc = krita_app.activeDocument()
+    if active_doc is None and getattr(tank.platform.current_engine(), "headless", False):
+        documents = krita_app.documents()
+        if documents:
+            active_doc = documents[-1]
+    return active_doc
+
+
+def check_memory_budget(operation, document, canvas_copies=1, extra_bytes=None):
+    """
+    Returns a warning message if copying the pixels of the whole canvas of
+    the document, or the given extra bytes, is expected to exceed the memory
+    budget of the engine, None otherwise.
+    """
+    memory_monitor = getattr(tank.platform.current_engine(), "memory_monitor", None)
+    if memory_monitor is None or document is None:
+        return None
+
+    if extra_bytes is None:
+        extra_bytes = canvas_copies * estimate_canvas_memory(document)
+    return memory_monitor.check(operation, document, extra_bytes)
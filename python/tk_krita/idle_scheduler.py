@@ -0,0 +1,106 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Runs callables one at a time when the Qt event loop is idle.
+
+"""
+
+import time
+import heapq
+import itertools
+
+from tank.platform.qt import QtCore
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+class IdleCommandScheduler(QtCore.QObject):
+    """
+    Queue of commands run by priority, one per iteration of the event loop.
+
+    Qt only fires a zero interval timer once all the pending events have been
+    processed, so Krita gets to paint and process the user input between
+    every command.
+    """
+
+    def __init__(self, logger, recorder=None, initial_delay=0, parent=None):
+        """
+        :param logger: Logger used to report how long every command took.
+        :param recorder: Optional SpanRecorder where the commands are also
+                         recorded.
+        :param initial_delay: Time in milliseconds to wait before running the
+                              first command, ie. to let the main window show.
+        """
+        super(IdleCommandScheduler, self).__init__(parent)
+
+        self._logger = logger
+        self._recorder = recorder
+        self._initial_delay = initial_delay
+        self._queue = []
+        self._counter = itertools.count()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run_next)
+
+        self.run_count = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, name, fn, priority=0):
+        """
+        Queues a command. Commands with a lower priority run first, commands
+        with the same priority run in the order they were added.
+        """
+        heapq.heappush(self._queue, (priority, next(self._counter), name, fn))
+
+    def start(self):
+        """
+        Starts running the queued commands.
+        """
+        if self._queue and not self._timer.isActive():
+            self._timer.start(self._initial_delay if not self.run_count else 0)
+
+    def cancel(self):
+        """
+        Forgets about the commands that did not run yet.
+        """
+        self._timer.stop()
+        self._queue = []
+
+    def _run_next(self):
+        """
+        Runs the next command and schedules the one after it.
+        """
+        if not self._queue:
+            return
+
+        (_, _, name, fn) = heapq.heappop(self._queue)
+
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            self._logger.exception("Error running startup command %s", name)
+        end = time.perf_counter()
+
+        self.run_count += 1
+        self._logger.debug("Ran startup command %s in %.1f ms", name, (end - start) * 1000.0)
+        if self._recorder is not None:
+            self._recorder.record("run at startup %s" % name, start, end)
+
+        if self._queue:
+            self._timer.start(0)
@@ -0,0 +1,230 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Machine readable log of the engine, written as json lines by a dedicated
+thread.
+
+"""
+
+import os
+import json
+import queue
+import threading
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# time in seconds the writer waits for more records before flushing
+FLUSH_INTERVAL = 1.0
+
+# maximum number of records written in one go
+BATCH_SIZE = 500
+
+# maximum number of records waiting to be written, records logged while the
+# queue is full are dropped instead of blocking the thread logging them.
+MAX_QUEUE_SIZE = 50000
+
+
+def log_record_to_dict(record, **extra):
+    """
+    Returns a json serializable dictionary from a standard python logging
+    record. Extra fields can be given as keyword arguments.
+    """
+    data = {
+        "created": record.created,
+        "relative_created_ms": record.relativeCreated,
+        "level": record.levelname,
+        "logger": record.name,
+        "message": record.getMessage(),
+        "thread": record.threadName,
+        "process": record.process,
+    }
+
+    if record.exc_info and record.exc_info[0] is not None:
+        data["exception"] = "%s: %s" % (record.exc_info[0].__name__, record.exc_info[1])
+
+    data.update(extra)
+    return data
+
+
+class JsonLogSink(object):
+    """
+    Writes log records as json lines to a file that is rotated once it grows
+    beyond a given size.
+
+    Records are serialized and written by a dedicated thread, in batches,
+    so the threads logging never wait for the disk.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        """
+        :param path: Path of the json lines file.
+        :param max_bytes: Size in bytes the file can grow to before being
+                          rotated.
+        :param backup_count: Number of rotated files kept, ie. path.1, path.2
+        """
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+
+        self._queue = queue.Queue(MAX_QUEUE_SIZE)
+        self._thread = None
+        self._stream = None
+
+        self.written_count = 0
+        self.dropped_count = 0
+
+    @property
+    def path(self):
+        """
+        Path of the json lines file.
+        """
+        return self._path
+
+    def start(self):
+        """
+        Starts the writer thread.
+        """
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="tk-krita json log writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Writes the pending records and stops the writer thread.
+        """
+        if self._thread is None:
+            return
+
+        # None tells the writer thread to finish. Never wait for room in the
+        # queue, the writer thread might be stuck on the disk.
+        while True:
+            try:
+                self._queue.put_nowait(None)
+                break
+            except queue.Full:
+                # make room for it, dropping the oldest record
+                try:
+                    self._queue.get_nowait()
+                    self.dropped_count += 1
+                except queue.Empty:
+                    pass
+
+        self._thread.join(timeout)
+        self._thread = None
+
+    def emit(self, data):
+        """
+        Queues a json serializable dictionary to be written. Can be called
+        from any thread and never blocks.
+        """
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.dropped_count += 1
+
+    def _run(self):
+        """
+        Writer thread loop.
+        """
+        running = True
+        while running:
+            try:
+                data = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+
+            batch = []
+            while True:
+                if data is None:
+                    running = False
+                    break
+
+                batch.append(data)
+                if len(batch) >= BATCH_SIZE:
+                    break
+
+                try:
+                    data = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+
+        self._close()
+
+    def _write(self, batch):
+        """
+        Writes a batch of records, rotating the file if needed.
+        """
+        try:
+            if self._stream is None:
+                self._open()
+
+            lines = []
+            for data in batch:
+                lines.append(json.dumps(data, default=str))
+            self._stream.write("\n".join(lines) + "\n")
+            self._stream.flush()
+            self.written_count += len(batch)
+
+            if self._max_bytes > 0 and self._stream.tell() >= self._max_bytes:
+                self._rotate()
+        except (IOError, OSError):
+            # the log cannot be written, do not let this bring the engine down
+            self.dropped_count += len(batch)
+            self._close()
+
+    def _open(self):
+        folder = os.path.dirname(self._path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._stream = open(self._path, "a")
+
+    def _close(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except (IOError, OSError):
+                pass
+            self._stream = None
+
+    def _rotate(self):
+        """
+        Rotates the files: path -> path.1 -> path.2 ... up to backup_count.
+        """
+        self._close()
+
+        if self._backup_count > 0:
+            for index in range(self._backup_count - 1, 0, -1):
+                source = "%s.%d" % (self._path, index)
+                destination = "%s.%d" % (self._path, index + 1)
+                if os.path.exists(source):
+                    if os.path.exists(destination):
+                        os.remove(destination)
+                    os.rename(source, destination)
+
+            destination = self._path + ".1"
+            if os.path.exists(destination):
+                os.remove(destination)
+            os.rename(self._path, destination)
+        else:
+            os.remove(self._path)
+
+        self._open()
@@ -0,0 +1,109 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Fixed size in memory buffer of the engine log records.
+
+"""
+
+import threading
+from collections import namedtuple
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# what we keep from every logging record
+LogEntry = namedtuple("LogEntry", ["created", "levelno", "levelname", "name", "message"])
+
+
+def log_entry_from_record(record, message):
+    """
+    Returns a LogEntry from a standard python logging record and its
+    formatted message.
+    """
+    return LogEntry(record.created, record.levelno, record.levelname, record.name, message)
+
+
+class LogRingBuffer(object):
+    """
+    Ring buffer of log entries. Appending is O(1) and once the buffer is full
+    the oldest entries are overwritten, so memory never grows beyond its
+    capacity.
+
+    Every entry gets a sequence number, which keeps growing as entries are
+    appended, so readers can ask for the entries they have not seen yet.
+    """
+
+    def __init__(self, capacity):
+        self._capacity = max(1, capacity)
+        self._entries = [None] * self._capacity
+        self._next_sequence = 0
+        self._cleared_sequence = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._next_sequence - self.first_sequence
+
+    @property
+    def capacity(self):
+        """
+        Maximum number of entries kept.
+        """
+        return self._capacity
+
+    @property
+    def first_sequence(self):
+        """
+        Sequence number of the oldest entry still in the buffer.
+        """
+        return max(self._cleared_sequence, self._next_sequence - self._capacity)
+
+    @property
+    def next_sequence(self):
+        """
+        Sequence number the next appended entry will get.
+        """
+        return self._next_sequence
+
+    def append(self, entry):
+        """
+        Appends a LogEntry, overwriting the oldest one if the buffer is full.
+        Can be called from any thread.
+        """
+        with self._lock:
+            self._entries[self._next_sequence % self._capacity] = entry
+            self._next_sequence += 1
+
+    def append_record(self, record, message):
+        """
+        Appends a standard python logging record and its formatted message.
+        """
+        self.append(log_entry_from_record(record, message))
+
+    def get(self, sequence):
+        """
+        Returns the entry with the given sequence number or None if it is not
+        in the buffer anymore.
+        """
+        if sequence < self.first_sequence or sequence >= self._next_sequence:
+            return None
+        return self._entries[sequence % self._capacity]
+
+    def clear(self):
+        """
+        Removes all the entries. Sequence numbers keep growing.
+        """
+        with self._lock:
+            self._entries = [None] * self._capacity
+            self._cleared_sequence = self._next_sequence
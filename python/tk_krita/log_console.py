@@ -0,0 +1,262 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Dockable console that shows the engine log records kept in memory.
+
+"""
+
+import time
+import logging
+
+from tank.platform.qt import QtGui, QtCore
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# time in milliseconds between checks for new log records while visible
+REFRESH_INTERVAL = 500
+
+LEVELS = [
+    ("Debug", logging.DEBUG),
+    ("Info", logging.INFO),
+    ("Warning", logging.WARNING),
+    ("Error", logging.ERROR),
+]
+
+LEVEL_COLORS = {
+    logging.WARNING: QtGui.QColor(230, 180, 60),
+    logging.ERROR: QtGui.QColor(230, 80, 80),
+}
+
+
+class LogRecordsModel(QtCore.QAbstractListModel):
+    """
+    Model exposing the log entries of a LogRingBuffer above a given level.
+
+    Only the sequence numbers of the matching entries are kept, the text of
+    an entry is only built when the view asks for it, which only happens for
+    the visible rows.
+    """
+
+    def __init__(self, log_buffer, parent=None):
+        super(LogRecordsModel, self).__init__(parent)
+        self._log_buffer = log_buffer
+        self._level = logging.DEBUG
+
+        # sequence numbers of the entries shown, rows start at self._offset
+        # so dropping the oldest rows does not need to shift the list.
+        self._sequences = []
+        self._offset = 0
+        self._scanned_sequence = log_buffer.first_sequence
+
+    @property
+    def level(self):
+        return self._level
+
+    def set_level(self, level):
+        """
+        Only show the entries at the given level or above.
+        """
+        self.beginResetModel()
+        self._level = level
+        self._sequences = []
+        self._offset = 0
+        self._scanned_sequence = self._log_buffer.first_sequence
+        self._scan()
+        self.endResetModel()
+
+    def refresh(self):
+        """
+        Forget about the entries that are not in the buffer anymore and add
+        the new ones.
+        """
+        first_sequence = self._log_buffer.first_sequence
+
+        # rows that were overwritten in the buffer
+        dropped = 0
+        for row in range(self._offset, len(self._sequences)):
+            if self._sequences[row] >= first_sequence:
+                break
+            dropped += 1
+
+        if dropped:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, dropped - 1)
+            self._offset += dropped
+            if self._offset > len(self._sequences) // 2:
+                self._sequences = self._sequences[self._offset :]
+                self._offset = 0
+            self.endRemoveRows()
+
+        # entries we have not seen yet
+        first_row = self.rowCount()
+        new_sequences = self._filter(
+            max(self._scanned_sequence, first_sequence), self._log_buffer.next_sequence
+        )
+        self._scanned_sequence = self._log_buffer.next_sequence
+
+        if new_sequences:
+            self.beginInsertRows(
+                QtCore.QModelIndex(), first_row, first_row + len(new_sequences) - 1
+            )
+            self._sequences.extend(new_sequences)
+            self.endInsertRows()
+
+    def _scan(self):
+        self._sequences = self._filter(
+            self._log_buffer.first_sequence, self._log_buffer.next_sequence
+        )
+        self._scanned_sequence = self._log_buffer.next_sequence
+
+    def _filter(self, start, end):
+        """
+        Returns the sequence numbers between start and end of the entries at
+        or above our level.
+        """
+        get = self._log_buffer.get
+        level = self._level
+        sequences = []
+        for sequence in range(start, end):
+            entry = get(sequence)
+            if entry is not None and entry.levelno >= level:
+                sequences.append(sequence)
+        return sequences
+
+    def entry(self, row):
+        """
+        Returns the LogEntry shown at the given row.
+        """
+        if row < 0 or row >= self.rowCount():
+            return None
+        return self._log_buffer.get(self._sequences[self._offset + row])
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._sequences) - self._offset
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        entry = self.entry(index.row())
+        if entry is None:
+            return None
+
+        if role == QtCore.Qt.DisplayRole:
+            return "%s  %-8s %s" % (
+                time.strftime("%H:%M:%S", time.localtime(entry.created)),
+                entry.levelname,
+                entry.message,
+            )
+
+        if role == QtCore.Qt.ForegroundRole:
+            for level in sorted(LEVEL_COLORS, reverse=True):
+                if entry.levelno >= level:
+                    return QtGui.QBrush(LEVEL_COLORS[level])
+
+        if role == QtCore.Qt.ToolTipRole:
+            return entry.name
+
+        return None
+
+
+class LogConsoleWidget(QtGui.QWidget):
+    """
+    Widget showing the engine log entries kept in memory, filtered by level.
+    New entries are only looked for while the widget is visible.
+    """
+
+    def __init__(self, log_buffer, parent=None):
+        super(LogConsoleWidget, self).__init__(parent)
+
+        self._log_buffer = log_buffer
+
+        self._level_combo = QtGui.QComboBox(self)
+        for (label, level) in LEVELS:
+            self._level_combo.addItem(label, level)
+        self._level_combo.currentIndexChanged.connect(self._on_level_changed)
+
+        self._follow_check = QtGui.QCheckBox("Follow", self)
+        self._follow_check.setChecked(True)
+
+        clear_button = QtGui.QPushButton("Clear", self)
+        clear_button.clicked.connect(self._on_clear)
+
+        self._model = LogRecordsModel(log_buffer, self)
+
+        # uniform item sizes lets the view only lay out the visible rows,
+        # which keeps it cheap with hundreds of thousands of entries.
+        self._view = QtGui.QListView(self)
+        self._view.setModel(self._model)
+        self._view.setUniformItemSizes(True)
+        self._view.setLayoutMode(QtGui.QListView.Batched)
+        self._view.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
+        self._view.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+
+        toolbar_layout = QtGui.QHBoxLayout()
+        toolbar_layout.addWidget(QtGui.QLabel("Level:", self))
+        toolbar_layout.addWidget(self._level_combo)
+        toolbar_layout.addStretch()
+        toolbar_layout.addWidget(self._follow_check)
+        toolbar_layout.addWidget(clear_button)
+
+        layout = QtGui.QVBoxLayout(self)
+        layout.addLayout(toolbar_layout)
+        layout.addWidget(self._view)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL)
+        self._timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """
+        Show the entries logged since the last refresh.
+        """
+        rows = self._model.rowCount()
+        self._model.refresh()
+
+        if self._follow_check.isChecked() and self._model.rowCount() != rows:
+            self._view.scrollToBottom()
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start()
+        return super(LogConsoleWidget, self).showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        return super(LogConsoleWidget, self).hideEvent(event)
+
+    def save_panel_state(self):
+        """
+        Returns the state of the console, kept while the panel is torn down.
+        """
+        return {
+            "level": self._level_combo.currentIndex(),
+            "follow": self._follow_check.isChecked(),
+        }
+
+    def restore_panel_state(self, state):
+        """
+        Restores the state returned by save_panel_state.
+        """
+        self._level_combo.setCurrentIndex(state.get("level", 0))
+        self._follow_check.setChecked(state.get("follow", True))
+
+    def _on_level_changed(self, index):
+        self._model.set_level(self._level_combo.itemData(index))
+        if self._follow_check.isChecked():
+            self._view.scrollToBottom()
+
+    def _on_clear(self, *_):
+        self._log_buffer.clear()
+        self._model.set_level(self._model.level)
@@ -0,0 +1,274 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Estimation of the memory used by the documents opened in Krita, so the hooks
+can warn the artist before an operation, ie. copying the pixels of a whole
+canvas, pushes the workstation into swap.
+
+Krita keeps the pixels in tiles and only allocates the tiles that were
+painted, so the estimates are the worst case: every layer fully painted
+within its bounds, plus the projection of the document.
+"""
+
+import os
+
+import krita
+
+from tank.platform.qt import QtGui
+
+from . import document_events
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# number of channels of the Krita color models
+COLOR_MODEL_CHANNELS = {
+    "A": 1,
+    "GRAYA": 2,
+    "RGBA": 4,
+    "XYZA": 4,
+    "LABA": 4,
+    "YCbCrA": 4,
+    "CMYKA": 5,
+}
+
+# bytes per channel of the Krita color depths
+COLOR_DEPTH_BYTES = {"U8": 1, "U16": 2, "F16": 2, "F32": 4}
+
+# masks are a single 8 bits channel, whatever the color space of the image
+MASK_NODE_TYPES = (
+    "transparencymask",
+    "filtermask",
+    "transformmask",
+    "selectionmask",
+    "colorizemask",
+)
+
+# nodes that do not keep pixels of their own
+NO_PIXEL_NODE_TYPES = ("clonelayer",)
+
+
+def _format_size(size):
+    return "%.1f MiB" % (size / (1024.0 * 1024.0))
+
+
+def bytes_per_pixel(color_model, color_depth):
+    """
+    Returns the size of a pixel in the given Krita color model and depth,
+    assuming RGBA 8 bits for the ones we do not know about.
+    """
+    return COLOR_MODEL_CHANNELS.get(color_model, 4) * COLOR_DEPTH_BYTES.get(color_depth, 1)
+
+
+def estimate_canvas_memory(document):
+    """
+    Returns the size in bytes of the pixels of the whole canvas of the given
+    document, ie. what a pixelData copy of it takes.
+    """
+    return (
+        document.width()
+        * document.height()
+        * bytes_per_pixel(document.colorModel(), document.colorDepth())
+    )
+
+
+def estimate_image_memory(path, document):
+    """
+    Returns the size in bytes of the pixels of the image file once loaded in
+    the color space of the given document, or None if Qt cannot read the
+    size of the image without loading it, ie. for the Krita own formats.
+    """
+    size = QtGui.QImageReader(path).size()
+    if not size.isValid():
+        return None
+
+    return (
+        size.width()
+        * size.height()
+        * bytes_per_pixel(document.colorModel(), document.colorDepth())
+    )
+
+
+def estimate_document_memory(document):
+    """
+    Returns a (size in bytes, number of nodes) tuple for the given document.
+
+    The node tree is walked without recursion, documents with deeply nested
+    groups would otherwise hit the python recursion limit.
+    """
+    # the projection of the image
+    size = estimate_canvas_memory(document)
+    node_count = 0
+
+    nodes = list(document.rootNode().childNodes())
+    while nodes:
+        node = nodes.pop()
+        node_count += 1
+
+        # layers only keep the pixels within their bounds
+        bounds = node.bounds()
+        pixels = bounds.width() * bounds.height()
+
+        node_type = node.type()
+        if node_type in MASK_NODE_TYPES:
+            size += pixels
+        elif node_type not in NO_PIXEL_NODE_TYPES:
+            # groups, filter and fill layers keep a projection too
+            size += pixels * bytes_per_pixel(node.colorModel(), node.colorDepth())
+
+        nodes.extend(node.childNodes())
+
+    return size, node_count
+
+
+class DocumentMemoryMonitor(object):
+    """
+    Keeps an estimate of the memory used by every opened document, see
+    estimate_document_memory, and checks operations against a budget.
+
+    Estimates are cached per document and dropped when the document is saved
+    or closed. Krita does not tell us about the layers being added or
+    removed, so the document an operation works on is estimated again when
+    the operation is checked.
+    """
+
+    def __init__(self, event_bus, metrics, budget=0):
+        """
+        :param event_bus: DocumentEventBus telling us when documents are saved
+                          or closed.
+        :param metrics: MetricsRegistry the estimates are published to.
+        :param budget: Memory in bytes the opened documents should fit in. A
+                       budget of 0 disables the checks.
+        """
+        self.budget = budget
+        self._metrics = metrics
+
+        # [document, (size, node count)] entries. Krita documents can be
+        # compared but not hashed, and there are only a few of them.
+        self._entries = []
+
+        event_bus.subscribe(document_events.DOCUMENT_SAVED, self._on_document_saved)
+        event_bus.subscribe(document_events.DOCUMENT_CLOSED, self._on_document_closed)
+
+    def _find_entry(self, document):
+        for entry in self._entries:
+            if entry[0] == document:
+                return entry
+        return None
+
+    def estimate(self, document, refresh=False):
+        """
+        Returns the (size in bytes, number of nodes) estimated for the given
+        document, from the cache unless refresh is True.
+        """
+        entry = self._find_entry(document)
+        if entry and not refresh:
+            return entry[1]
+
+        estimate = estimate_document_memory(document)
+        if entry:
+            entry[1] = estimate
+        else:
+            self._entries.append([document, estimate])
+
+        return estimate
+
+    def total(self):
+        """
+        Returns the memory in bytes estimated for all the opened documents.
+        """
+        documents = krita.Krita.instance().documents()
+        self._entries = [entry for entry in self._entries if entry[0] in documents]
+        return sum(self.estimate(document)[0] for document in documents)
+
+    def check(self, operation, document=None, extra_bytes=0):
+        """
+        Checks if an operation allocating the given extra memory fits in the
+        budget, on top of the opened documents.
+
+        :param operation: Name of the operation, used in the warning.
+        :param document: Document the operation works on, estimated again
+                         since it is the one most likely to have changed.
+        :param extra_bytes: Memory the operation is expected to allocate.
+        :returns: A warning message for the artist if the budget would be
+                  exceeded, None otherwise.
+        """
+        if self.budget <= 0:
+            return None
+
+        if document is not None:
+            self.estimate(document, refresh=True)
+
+        total = self.total()
+        self.update_metrics(total)
+        if total + extra_bytes <= self.budget:
+            return None
+
+        self._metrics.counter(
+            "tk_krita_memory_budget_warnings_total",
+            "Operations that were expected to exceed the memory budget.",
+        ).inc()
+
+        return (
+            "%s could need %s on top of the %s estimated for the opened documents, "
+            "exceeding the memory budget of %s. Consider closing some documents first."
+            % (
+                operation,
+                _format_size(extra_bytes),
+                _format_size(total),
+                _format_size(self.budget),
+            )
+        )
+
+    def update_metrics(self, total=None):
+        """
+        Publishes the current estimates to the metrics registry.
+        """
+        if total is None:
+            total = self.total()
+
+        self._metrics.gauge(
+            "tk_krita_documents_memory_estimate_bytes",
+            "Worst case memory estimated for the opened documents.",
+        ).set(total)
+        self._metrics.gauge("tk_krita_documents_open", "Number of opened documents.").set(
+            len(self._entries)
+        )
+        self._metrics.gauge(
+            "tk_krita_memory_budget_bytes", "Memory budget of the opened documents."
+        ).set(self.budget)
+
+    def stats(self):
+        """
+        Returns a dictionary of document name -> estimate, for the logs.
+        """
+        stats = {}
+        for (document, (size, node_count)) in self._entries:
+            name = document.fileName() or document.name()
+            stats[name] = {"bytes": size, "nodes": node_count}
+        return stats
+
+    def _on_document_saved(self, path):
+        # the layers of the document might have changed since it was estimated
+        self._entries = [
+            entry
+            for entry in self._entries
+            if not entry[0].fileName() or os.path.abspath(entry[0].fileName()) != path
+        ]
+
+    def _on_document_closed(self, path):
+        # the document is gone by now, forget about the ones Krita forgot
+        documents = krita.Krita.instance().documents()
+        self._entries = [entry for entry in self._entries if entry[0] in documents]
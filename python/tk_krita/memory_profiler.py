@@ -0,0 +1,182 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Memory profiling of the Toolkit operations with tracemalloc.
+
+Tracing python allocations slows python down and snapshots of a big heap can
+take a while, so this is meant to be enabled only while looking for the
+operations that retain memory, ie. the pixel data of the exported layers.
+"""
+
+import os
+import time
+import datetime
+import tracemalloc
+import contextlib
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# number of frames stored for every allocation, enough to get from the
+# Krita API call back to the hook that made it.
+TRACEBACK_FRAMES = 10
+
+# number of allocation sites reported per operation
+TOP_STATS = 15
+
+
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024.0:
+            return "%.1f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GiB" % size
+
+
+class MemoryProfiler(object):
+    """
+    Takes tracemalloc snapshots before and after operations and writes the
+    allocation sites that grew the most, along with the peak memory reached
+    during the operation, to a report in the given folder.
+
+    Operations can be nested, ie. a publish phase run from a menu command,
+    and are expected to run in the main thread.
+    """
+
+    def __init__(self, folder, logger, top=TOP_STATS):
+        """
+        :param folder: Folder the report is written to.
+        :param logger: Logger used to give a summary of every operation.
+        :param top: Number of allocation sites reported per operation.
+        """
+        self._logger = logger
+        self._top = top
+        self._stack = []
+        self._started_tracing = False
+
+        self.report_path = os.path.join(
+            folder,
+            "tk-krita_memory_%s_%s.log"
+            % (datetime.datetime.now().strftime("%Y%m%d_%H%M%S"), os.getpid()),
+        )
+
+    def start(self):
+        """
+        Starts tracing the python allocations, if nobody else did.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+            self._started_tracing = True
+
+    def stop(self):
+        """
+        Stops tracing the python allocations, if we started it.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """
+        Profiles the memory allocated by the code run in the with statement.
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+
+        entry = self._push()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._pop(name, entry, time.perf_counter() - start)
+
+    def _take_snapshot(self):
+        # leave out our own allocations, ie. formatting the report
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, __file__, all_frames=True),
+                tracemalloc.Filter(False, tracemalloc.__file__, all_frames=True),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+    def _push(self):
+        (current, peak) = tracemalloc.get_traced_memory()
+        if self._stack:
+            # the peak is about to be reset, keep it for the outer operation
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+        # reset_peak is only available from python 3.9, before that the peak
+        # is the one of the whole session.
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+            peak = current
+
+        entry = {"snapshot": self._take_snapshot(), "current": current, "peak": peak}
+        self._stack.append(entry)
+        return entry
+
+    def _pop(self, name, entry, duration):
+        (current, peak) = tracemalloc.get_traced_memory()
+        peak = max(peak, entry["peak"])
+        snapshot = self._take_snapshot()
+
+        self._stack.remove(entry)
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+        stats = [
+            stat
+            for stat in snapshot.compare_to(entry["snapshot"], "traceback")
+            if stat.size_diff > 0
+        ][: self._top]
+
+        lines = [
+            "=" * 79,
+            "%s  %s" % (datetime.datetime.now().isoformat(), name),
+            "duration: %.3fs  retained: %s  peak delta: %s"
+            % (
+                duration,
+                _format_size(current - entry["current"]),
+                _format_size(peak - entry["current"]),
+            ),
+            "",
+        ]
+        for stat in stats:
+            lines.append(
+                "%s in %d blocks (%+d)"
+                % (_format_size(stat.size_diff), stat.count, stat.count_diff)
+            )
+            lines.extend(
+                "    " + line for line in stat.traceback.format(most_recent_first=True)
+            )
+        lines.append("")
+
+        try:
+            with open(self.report_path, "a") as report_file:
+                report_file.write("\n".join(lines) + "\n")
+        except (IOError, OSError) as e:
+            self._logger.debug("Could not write the memory report %s: %s", self.report_path, e)
+
+        self._logger.debug(
+            "Memory of '%s': retained %s, peak delta %s, see %s",
+            name,
+            _format_size(current - entry["current"]),
+            _format_size(peak - entry["current"]),
+            self.report_path,
+        )
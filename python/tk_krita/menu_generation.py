@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -16,10 +16,12 @@ Menu handling for this engine
 """
 
 import tank
+import krita
 import sys
 import os
 import subprocess
 import unicodedata
+import contextlib
 
 from tank.util import is_windows, is_linux, is_macos
 from tank.platform.qt import QtGui, QtCore
@@ -29,32 +31,41 @@ __author__ = "Diego Garcia Huerta"
 __contact__ = "https://www.linkedin.com/in/diegogh/"
 
 
-def get_menubar():
+def get_menubar(window_registry=None):
     """
-    Retrieves the Menu bar of the QApplication
+    Retrieves the Menu bar of the Krita main window
     """
-    qt_app = QtGui.QApplication.instance()
+    if window_registry is not None:
+        return window_registry.menubar
 
-    for widget in qt_app.allWidgets():
-        is_menu = isinstance(widget, QtGui.QMenuBar)
-        if is_menu:
-            if isinstance(widget.parent(), QtGui.QMainWindow):
-                return widget
+    krita_instance = krita.Krita.instance()
+
+    window = krita_instance.activeWindow()
+    if window is None:
+        windows = krita_instance.windows()
+        if not windows:
+            return None
+        window = windows[0]
+
+    # note that menuBar() would create a menu bar if there was none yet
+    menu_bar = window.qwindow().menuWidget()
+    if isinstance(menu_bar, QtGui.QMenuBar):
+        return menu_bar
 
 
-def can_create_menu():
-    """ 
+def can_create_menu(window_registry=None):
+    """
     This is used to indicate if the menu can be created in this DCC app.
     Only when there is a menu bar available we can create the menu.
     """
-    return get_menubar() is not None
+    return get_menubar(window_registry) is not None
 
 
-def get_or_create_shotgun_menu(menu_name):
+def get_or_create_shotgun_menu(menu_name, window_registry=None):
     """
     Creates or retrieves the Shotgun Menu entry in the Menu bar.
     """
-    menu_bar = get_menubar()
+    menu_bar = get_menubar(window_registry)
     if menu_bar:
         for action in menu_bar.actions():
             if action.text().replace("&", "") == menu_name:
@@ -69,8 +80,9 @@ def get_or_create_shotgun_menu(menu_name):
 
 # borrowed from tk-maya, needed to remove the args from the QAction callbacks
 class Callback(object):
-    def __init__(self, callback):
+    def __init__(self, callback, name=None):
         self.callback = callback
+        self.name = name or getattr(callback, "__name__", str(callback))
 
     def __call__(self, *_):
         """
@@ -97,8 +109,19 @@ class Callback(object):
         Execute the callback and log any exception that gets raised which may otherwise have been
         swallowed by the deferred execution of the callback.
         """
+        current_engine = tank.platform.current_engine()
         try:
-            self.callback()
+            with contextlib.ExitStack() as stack:
+                # see KritaEngine.trace_recorder and KritaEngine.memory_profiler
+                trace_recorder = getattr(current_engine, "trace_recorder", None)
+                if trace_recorder is not None:
+                    stack.enter_context(trace_recorder.span(self.name, "menu"))
+
+                memory_profiler = getattr(current_engine, "memory_profiler", None)
+                if memory_profiler is not None:
+                    stack.enter_context(memory_profiler.profile("menu: %s" % self.name))
+
+                self.callback()
         except Exception:
             current_engine = tank.platform.current_engine()
             current_engine.logger.exception("An exception was raised from Toolkit")
@@ -120,7 +143,9 @@ class MenuGenerator(object):
         In order to have commands enable/disable themselves based on the
         enable_callback, re-create the menu items every time.
         """
-        self._handle = get_or_create_shotgun_menu(self._menu_name)
+        self._handle = get_or_create_shotgun_menu(
+            self._menu_name, getattr(self._engine, "window_registry", None)
+        )
 
         # there is a slight chance we could not create the QMenu, so check
         # for this a bail out as soon as possible.
@@ -208,7 +233,7 @@ class MenuGenerator(object):
         action = QtGui.QAction(name, parent_menu)
         parent_menu.addAction(action)
         if callback:
-            action.triggered.connect(Callback(callback))
+            action.triggered.connect(Callback(callback, name))
 
         if properties:
             if "tooltip" in properties:
@@ -243,6 +268,15 @@ class MenuGenerator(object):
             properties={"checkable": self._engine.active_document_context_switch},
         )
 
+        trace_recorder = getattr(self._engine, "trace_recorder", None)
+        if trace_recorder is not None:
+            self._add_menu_item(
+                "Record Trace",
+                ctx_menu,
+                self._toggle_tracing,
+                properties={"checkable": trace_recorder.enabled},
+            )
+
         self._add_divider(ctx_menu)
 
         self._add_menu_item("Jump to Shotgun", ctx_menu, self._jump_to_sg)
@@ -258,11 +292,18 @@ class MenuGenerator(object):
 
     def _toggle_multi_document(self):
         """
-        This disables/enables upadtes of engine context if the active 
+        This disables/enables upadtes of engine context if the active
         document changes to some file known by tookit.
         """
         self._engine.toggle_active_document_context_switch()
 
+    def _toggle_tracing(self):
+        """
+        Starts or stops recording the trace of the engine activity, see
+        tk_krita.trace_recorder.
+        """
+        self._engine.toggle_tracing()
+
     def _jump_to_sg(self):
         """
         Jump to shotgun, launch web browser
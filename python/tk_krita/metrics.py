@@ -0,0 +1,281 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+In process performance metrics of the engine: counters, gauges and timers,
+where timers are histograms of durations in seconds with fixed buckets, so
+memory does not grow with the length of the session.
+
+Hooks can use them through the engine:
+
+    with engine.metrics.timer("tk_krita_export_layer_seconds"):
+        ...
+
+    engine.metrics.counter("tk_krita_layers_exported_total").inc()
+"""
+
+import os
+import time
+import bisect
+import threading
+import contextlib
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# upper bounds in seconds of the buckets used by default, from UI events to
+# multi-minute publishes.
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+
+class Counter(object):
+    """
+    A value that only goes up.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": self.kind, "value": self._value}
+
+    def prometheus_lines(self, labels):
+        return ["%s%s %s" % (self.name, _format_labels(labels), _format_value(self._value))]
+
+
+class Gauge(object):
+    """
+    A value that goes up and down, ie. a size.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help_text = help_text
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": self.kind, "value": self._value}
+
+    def prometheus_lines(self, labels):
+        return ["%s%s %s" % (self.name, _format_labels(labels), _format_value(self._value))]
+
+
+class Histogram(object):
+    """
+    Distribution of observed values in fixed buckets, along with their count,
+    sum, minimum and maximum.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self._buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._min = None
+        self._max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self._buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._min = value if self._min is None else min(self._min, value)
+            self._max = value if self._max is None else max(self._max, value)
+
+    @property
+    def count(self):
+        return self._count
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = []
+            for (bound, count) in zip(self._buckets + (float("inf"),), self._counts):
+                cumulative += count
+                buckets.append((bound, cumulative))
+
+            return {
+                "type": self.kind,
+                "count": self._count,
+                "sum": self._sum,
+                "min": self._min,
+                "max": self._max,
+                "mean": self._sum / self._count if self._count else None,
+                "buckets": buckets,
+            }
+
+    def prometheus_lines(self, labels):
+        snapshot = self.snapshot()
+        lines = []
+        for (bound, cumulative) in snapshot["buckets"]:
+            bucket_labels = dict(labels, le="+Inf" if bound == float("inf") else repr(bound))
+            lines.append(
+                "%s_bucket%s %s" % (self.name, _format_labels(bucket_labels), cumulative)
+            )
+        lines.append(
+            "%s_sum%s %s" % (self.name, _format_labels(labels), _format_value(snapshot["sum"]))
+        )
+        lines.append("%s_count%s %s" % (self.name, _format_labels(labels), snapshot["count"]))
+        return lines
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for (key, value) in sorted(labels.items())
+    )
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsRegistry(object):
+    """
+    Named counters and histograms of the engine.
+    """
+
+    def __init__(self, labels=None):
+        """
+        :param labels: Labels added to every metric when dumped, ie. the pid
+                       so several Krita sessions can be told apart.
+        """
+        self._labels = dict(labels or {})
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help_text, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError("Metric '%s' is already a %s." % (name, metric.kind))
+            return metric
+
+    def counter(self, name, help_text=""):
+        """
+        Returns the counter with the given name, creating it if needed.
+        """
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        """
+        Returns the gauge with the given name, creating it if needed.
+        """
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        """
+        Returns the histogram with the given name, creating it if needed.
+        """
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    @contextlib.contextmanager
+    def timer(self, name, help_text=""):
+        """
+        Records the time in seconds spent in the with statement in the
+        histogram with the given name.
+        """
+        histogram = self.histogram(name, help_text)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Returns a dictionary of metric name -> current values.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return dict((metric.name, metric.snapshot()) for metric in metrics)
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda x: x.name)
+
+        lines = []
+        for metric in metrics:
+            if metric.help_text:
+                lines.append("# HELP %s %s" % (metric.name, metric.help_text))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.prometheus_lines(self._labels))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics to a file, ie. for the node exporter textfile
+        collector. The file is replaced atomically so it is never read half
+        written.
+        """
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        tmp_path = "%s.%s.tmp" % (path, os.getpid())
+        with open(tmp_path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
@@ -0,0 +1,227 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Suspension of the panels docked by the engine while nobody is looking at
+them.
+
+Panels can optionally implement any of these methods:
+
+- panel_suspended(): the panel was hidden, ie. its dock was closed or
+  tabbed away. Pause any refresh work.
+- panel_resumed(): the panel is visible again.
+- panel_can_be_torn_down(): returns True if the panel can be torn down
+  while hidden. The app must not keep a reference to the panel, since a new
+  one is created when it is shown again, and returned by show_panel.
+- save_panel_state(): returns a json serializable state of the panel,
+  before the panel is torn down.
+- restore_panel_state(state): restores the state of a rebuilt panel.
+
+Panels that do not implement panel_can_be_torn_down are only suspended.
+"""
+
+import time
+
+from tank.platform.qt import QtGui, QtCore
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+class _PanelInfo(object):
+    """
+    What we know about a docked panel.
+    """
+
+    def __init__(self, dock_widget, rebuild_fn):
+        self.dock_widget = dock_widget
+        self.rebuild_fn = rebuild_fn
+        self.hidden_since = None
+        self.torn_down = False
+        self.state = None
+
+
+class PanelLifecycleManager(QtCore.QObject):
+    """
+    Tells the panels docked by the engine when they are hidden or visible
+    again, and tears down the panels that stay hidden for longer than a
+    given time, rebuilding them once their dock is shown again.
+    """
+
+    def __init__(self, suspend_timeout=0, logger=None, parent=None):
+        """
+        :param suspend_timeout: Time in seconds a panel can stay hidden before
+                                it is torn down. 0 means panels are never
+                                torn down.
+        :param logger: Optional logger.
+        """
+        super(PanelLifecycleManager, self).__init__(parent)
+
+        self._suspend_timeout = suspend_timeout
+        self._logger = logger
+        self._panels = []
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._check_hidden_panels)
+        if suspend_timeout > 0:
+            # check often enough to be within 10% of the timeout
+            self._timer.setInterval(max(1000, suspend_timeout * 100))
+
+        self.torn_down_count = 0
+        self.rebuilt_count = 0
+
+    def add(self, dock_widget, rebuild_fn):
+        """
+        Manages the panel docked in the given dock widget.
+
+        :param rebuild_fn: Function returning a new instance of the panel,
+                           used when the panel was torn down and its dock
+                           is visible again.
+        """
+        if self._find(dock_widget) is not None:
+            return
+
+        self._panels.append(_PanelInfo(dock_widget, rebuild_fn))
+        dock_widget.visibilityChanged.connect(self._on_visibility_changed)
+
+    def remove(self, dock_widget):
+        """
+        Stops managing the panel of the given dock widget.
+        """
+        info = self._find(dock_widget)
+        if info is None:
+            return
+
+        try:
+            dock_widget.visibilityChanged.disconnect(self._on_visibility_changed)
+        except (TypeError, RuntimeError):
+            # not connected or the dock widget is already gone
+            pass
+        self._panels.remove(info)
+
+    def widget(self, dock_widget):
+        """
+        Returns the panel of the given dock widget, rebuilding it if it was
+        torn down.
+        """
+        info = self._find(dock_widget)
+        if info is not None and info.torn_down:
+            self._rebuild(info)
+        return dock_widget.widget()
+
+    def _find(self, dock_widget):
+        for info in self._panels:
+            if info.dock_widget is dock_widget:
+                return info
+        return None
+
+    def _on_visibility_changed(self, visible):
+        info = self._find(self.sender())
+        if info is None:
+            return
+
+        if visible:
+            info.hidden_since = None
+            if info.torn_down:
+                self._rebuild(info)
+            else:
+                self._call_panel(info.dock_widget.widget(), "panel_resumed")
+        elif info.hidden_since is None:
+            info.hidden_since = time.monotonic()
+            self._call_panel(info.dock_widget.widget(), "panel_suspended")
+
+            if self._suspend_timeout > 0 and not self._timer.isActive():
+                self._timer.start()
+
+    def _check_hidden_panels(self):
+        """
+        Tears down the panels hidden for too long.
+        """
+        now = time.monotonic()
+        hidden_panels = False
+
+        for info in self._panels:
+            if info.hidden_since is None or info.torn_down:
+                continue
+
+            if now - info.hidden_since >= self._suspend_timeout:
+                self._tear_down(info)
+            else:
+                hidden_panels = True
+
+        if not hidden_panels:
+            self._timer.stop()
+
+    def _tear_down(self, info):
+        """
+        Replaces the panel by an empty placeholder, keeping its state.
+        """
+        widget = info.dock_widget.widget()
+        if widget is None:
+            return
+
+        # the app could be holding on to the panel, deleting it would leave
+        # the app with a dead widget
+        if not self._call_panel(widget, "panel_can_be_torn_down"):
+            # stays suspended, no need to check it again until it is shown
+            info.hidden_since = None
+            return
+
+        info.state = self._call_panel(widget, "save_panel_state")
+
+        placeholder = QtGui.QWidget(info.dock_widget)
+        placeholder.setObjectName(widget.objectName())
+        info.dock_widget.setWidget(placeholder)
+
+        widget.close()
+        widget.deleteLater()
+        info.torn_down = True
+        self.torn_down_count += 1
+
+        if self._logger:
+            self._logger.debug("Tore down hidden panel %s", info.dock_widget.objectName())
+
+    def _rebuild(self, info):
+        """
+        Creates the panel again and restores its state.
+        """
+        widget = info.rebuild_fn()
+        placeholder = info.dock_widget.widget()
+        info.dock_widget.setWidget(widget)
+        if placeholder is not None:
+            placeholder.deleteLater()
+
+        if info.state is not None:
+            self._call_panel(widget, "restore_panel_state", info.state)
+
+        info.torn_down = False
+        info.state = None
+        self.rebuilt_count += 1
+
+        if self._logger:
+            self._logger.debug("Rebuilt panel %s", info.dock_widget.objectName())
+
+    def _call_panel(self, widget, method_name, *args):
+        """
+        Calls the given optional method of the panel, if implemented.
+        """
+        method = getattr(widget, method_name, None)
+        if method is None:
+            return None
+
+        try:
+            return method(*args)
+        except Exception:
+            if self._logger:
+                self._logger.exception("Error calling %s of panel %s", method_name, widget)
+            return None
@@ -0,0 +1,141 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+PyQt5 shims for the signal overloads tk apps expect from PySide.
+
+Note that this module is loaded by the engine while Qt is being set up for
+toolkit, before any of our other modules can be imported, so it should only
+depend on the standard library and the Qt modules given to it.
+"""
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+class NoArgsSignalOverload(object):
+    """
+    Descriptor that adds back the no arguments overload of a signal, ie.
+    `action.triggered[()]`, which PyQt5 no longer provides for signals with
+    default arguments.
+
+    From the docs:
+    https://www.riverbankcomputing.com/static/Docs/PyQt5/incompatibilities.html#qt-signals-with-default-arguments
+
+    Explanation:
+    https://stackoverflow.com/questions/44371451/python-pyqt-qt-qmenu-qaction-syntax
+
+    A lot of tk apps connect to the QAction triggered signal with
+    `triggered[()].connect`, which PyQt5 does not support, and changing the tk
+    apps is out of the scope of this engine.
+
+    Nothing is done when a widget is created: plain uses of the signal go
+    straight to the PyQt5 signal, and only the first time the `[()]` overload
+    of a widget is used, its signal is relayed to a signal without arguments.
+    """
+
+    def __init__(self, base_class, name):
+        """
+        :param base_class: PyQt5 class defining the signal.
+        :param name: Name of the signal.
+        """
+        self._signal = getattr(base_class, name)
+        self._noargs_name = "%s_noargs" % name
+        self._relay_name = "_relay_%s" % name
+        self._flag_name = "_%s_relayed" % name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self._signal
+        return BoundSignalOverloads(self, instance, self._signal.__get__(instance, owner))
+
+    def get_noargs_signal(self, instance):
+        """
+        Returns the signal without arguments of the given widget, relaying
+        the PyQt5 signal to it the first time.
+        """
+        if not instance.__dict__.get(self._flag_name):
+            self._signal.__get__(instance, type(instance)).connect(
+                getattr(instance, self._relay_name)
+            )
+            instance.__dict__[self._flag_name] = True
+        return getattr(instance, self._noargs_name)
+
+
+class BoundSignalOverloads(object):
+    """
+    What NoArgsSignalOverload returns for a widget: behaves as the PyQt5 bound
+    signal, except for the `[()]` overload.
+    """
+
+    __slots__ = ("_descriptor", "_instance", "_signal")
+
+    def __init__(self, descriptor, instance, signal):
+        self._descriptor = descriptor
+        self._instance = instance
+        self._signal = signal
+
+    def __getitem__(self, key):
+        if key == ():
+            return self._descriptor.get_noargs_signal(self._instance)
+        return self._signal[key]
+
+    def connect(self, *args, **kwargs):
+        return self._signal.connect(*args, **kwargs)
+
+    def disconnect(self, *args, **kwargs):
+        return self._signal.disconnect(*args, **kwargs)
+
+    def emit(self, *args):
+        return self._signal.emit(*args)
+
+    def __call__(self, *args):
+        # so other signals can be connected to this one
+        return self._signal.emit(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._signal, name)
+
+
+def make_signal_shims(QtCore, QtGui):
+    """
+    Returns the QAction and QAbstractButton classes with the `[()]` overload
+    of their triggered and clicked signals.
+
+    :param QtCore: The QtCore module.
+    :param QtGui: The QtGui module, including the widgets.
+    """
+
+    class QAction(QtGui.QAction):
+        """
+        QAction supporting `triggered[()]`, see NoArgsSignalOverload.
+        """
+
+        triggered_noargs = QtCore.pyqtSignal()
+        triggered = NoArgsSignalOverload(QtGui.QAction, "triggered")
+
+        def _relay_triggered(self, checked=False):
+            self.triggered_noargs.emit()
+
+    class QAbstractButton(QtGui.QAbstractButton):
+        """
+        QAbstractButton supporting `clicked[()]`, see NoArgsSignalOverload.
+        """
+
+        clicked_noargs = QtCore.pyqtSignal()
+        clicked = NoArgsSignalOverload(QtGui.QAbstractButton, "clicked")
+
+        def _relay_clicked(self, checked=False):
+            self.clicked_noargs.emit()
+
+    return QAction, QAbstractButton
@@ -0,0 +1,176 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Detection of the Krita main thread being blocked by Toolkit operations.
+
+"""
+
+import sys
+import time
+import threading
+import traceback
+import contextlib
+import collections
+
+from tank.platform.qt import QtCore
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# maximum number of stalls kept in memory
+MAX_STALLS = 100
+
+
+class StallWatchdog(QtCore.QObject):
+    """
+    Watches the main thread from a separate thread while Toolkit operations
+    are running.
+
+    The main thread updates a heartbeat from a timer. When the heartbeat is
+    late by more than the threshold, the watchdog thread captures the python
+    stack of the main thread. Once the main thread is responsive again, the
+    stall is logged along with how long it lasted, the operation that was
+    running and the active document.
+    """
+
+    def __init__(self, threshold, logger, document_fn=None, parent=None):
+        """
+        :param threshold: Time in milliseconds the main thread can be
+                          blocked before it is considered a stall.
+        :param logger: Logger used to report the stalls.
+        :param document_fn: Optional function returning the active document
+                            name, called in the main thread.
+        """
+        super(StallWatchdog, self).__init__(parent)
+
+        self._threshold = threshold / 1000.0
+        self._logger = logger
+        self._document_fn = document_fn
+
+        self._lock = threading.Lock()
+        self._operations = []
+        self._pending_stall = None
+        self._last_beat = time.perf_counter()
+        self._main_thread_id = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # check a few times per threshold so stalls are caught early
+        interval = max(10, int(threshold / 4))
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._beat)
+        self._check_interval = interval / 1000.0
+
+        self.stalls = collections.deque(maxlen=MAX_STALLS)
+
+    def start(self):
+        """
+        Starts watching. Must be called from the main thread.
+        """
+        if self._thread is not None:
+            return
+
+        self._main_thread_id = threading.current_thread().ident
+        self._last_beat = time.perf_counter()
+        self._timer.start()
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="tk-krita stall watchdog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops watching.
+        """
+        if self._thread is None:
+            return
+
+        self._timer.stop()
+        self._stop_event.set()
+        self._thread = None
+
+    @contextlib.contextmanager
+    def operation(self, name):
+        """
+        Marks the code in the with statement as a Toolkit operation, only
+        stalls happening while an operation is running are reported.
+        """
+        with self._lock:
+            self._operations.append(name)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._operations.pop()
+
+    def _beat(self):
+        """
+        Main thread heartbeat, also reports the stall that just ended, if any.
+        """
+        now = time.perf_counter()
+
+        with self._lock:
+            self._last_beat = now
+            stall = self._pending_stall
+            self._pending_stall = None
+
+        if stall is None:
+            return
+
+        stall["duration_ms"] = round((now - stall.pop("started")) * 1000.0, 3)
+        stall["document"] = None
+        if self._document_fn:
+            try:
+                stall["document"] = self._document_fn()
+            except Exception:
+                pass
+
+        self.stalls.append(stall)
+        self._logger.warning(
+            "Krita was blocked for %.0f ms while running '%s' (document: %s):\n%s",
+            stall["duration_ms"],
+            stall["operation"],
+            stall["document"],
+            "".join(stall["stack"]),
+        )
+
+    def _run(self):
+        """
+        Watchdog thread loop.
+        """
+        while not self._stop_event.wait(self._check_interval):
+            with self._lock:
+                if self._pending_stall is not None or not self._operations:
+                    continue
+
+                started = self._last_beat
+                if time.perf_counter() - started < self._threshold:
+                    continue
+
+                operation = self._operations[-1]
+
+            frame = sys._current_frames().get(self._main_thread_id)
+            stack = traceback.format_stack(frame) if frame is not None else []
+
+            with self._lock:
+                # the main thread could have come back in the meantime
+                if self._last_beat == started:
+                    self._pending_stall = {
+                        "operation": operation,
+                        "started": started,
+                        "stack": stack,
+                    }
@@ -0,0 +1,223 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Cooperative scheduler of long running tasks in the main thread.
+
+The Krita API can only be used from the main thread, so long operations,
+ie. exporting every layer of a document, freeze Krita until they finish.
+Written as generators that yield between steps, these operations can be run
+in slices of time, letting Krita repaint and process events in between:
+
+    def export_layers(nodes):
+        for node in nodes:
+            node.save(...)
+            yield "Exported %s" % node.name()
+
+    scheduler.run_until_complete(scheduler.add(export_layers(nodes)))
+"""
+
+import time
+import itertools
+
+from tank.platform.qt import QtCore
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# time in milliseconds a slice can take, roughly a frame at 60fps
+TIME_BUDGET = 16
+
+
+class TaskCancelled(Exception):
+    """
+    Raised by run_until_complete when the task was cancelled.
+    """
+
+
+class Task(object):
+    """
+    A generator run by the TaskScheduler.
+    """
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, name, generator, priority, callback):
+        self.name = name
+        self.priority = priority
+        self.state = Task.PENDING
+
+        # last value yielded by the generator, ie. a progress message
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.steps = 0
+
+        self._generator = generator
+        self._callbacks = [callback] if callback else []
+
+    @property
+    def done(self):
+        """
+        Returns True if the task is not going to run anymore.
+        """
+        return self.state != Task.PENDING
+
+    def add_done_callback(self, callback):
+        """
+        Calls the given function with the task once it is done, failed or
+        cancelled.
+        """
+        self._callbacks.append(callback)
+
+    def cancel(self):
+        """
+        Stops the task, the code after the yield it is waiting on never runs.
+        """
+        if self.done:
+            return
+
+        # the task can be cancelled by the code it runs, ie. a Krita event
+        # processed while it exports. A running generator cannot be closed,
+        # it is closed by step once it yields.
+        if not getattr(self._generator, "gi_running", False):
+            self._generator.close()
+        self._finish(Task.CANCELLED)
+
+    def step(self):
+        """
+        Runs the task until its next yield.
+        """
+        try:
+            progress = next(self._generator)
+        except StopIteration as e:
+            if not self.done:
+                self.result = e.value
+                self._finish(Task.DONE)
+            return
+        except Exception as e:
+            if not self.done:
+                self.error = e
+                self._finish(Task.FAILED)
+            return
+
+        if self.done:
+            # cancelled while it was running
+            self._generator.close()
+            return
+
+        self.progress = progress
+        self.steps += 1
+
+    def _finish(self, state):
+        self.state = state
+        for callback in self._callbacks:
+            callback(self)
+
+
+class TaskScheduler(QtCore.QObject):
+    """
+    Runs generator based tasks in time slices driven by a QTimer.
+
+    Every slice runs steps of the pending tasks until the time budget is
+    spent. Tasks with a lower priority value run first, tasks with the same
+    priority take turns.
+    """
+
+    def __init__(self, time_budget=TIME_BUDGET, parent=None):
+        """
+        :param time_budget: Time in milliseconds every slice can take.
+        """
+        super(TaskScheduler, self).__init__(parent)
+
+        self._time_budget = time_budget / 1000.0
+        self._tasks = []
+        self._counter = itertools.count()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._run_slice)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def add(self, generator, name=None, priority=0, callback=None):
+        """
+        Schedules a generator to run.
+
+        :param callback: Optional function called with the task once it is
+                         done, failed or cancelled.
+        :returns: The Task.
+        """
+        name = name or getattr(generator, "__name__", "task")
+        task = Task(name, generator, priority, callback)
+        self._tasks.append((priority, next(self._counter), task))
+        self._tasks.sort(key=lambda x: x[:2])
+
+        if not self._timer.isActive():
+            self._timer.start()
+        return task
+
+    def cancel_all(self):
+        """
+        Cancels all the pending tasks.
+        """
+        tasks = self._tasks
+        self._tasks = []
+        self._timer.stop()
+        for (_, _, task) in tasks:
+            task.cancel()
+
+    def run_until_complete(self, task):
+        """
+        Waits for the task to finish while Krita keeps processing events.
+
+        :returns: The value returned by the generator.
+        :raises: The exception raised by the generator or TaskCancelled.
+        """
+        if not task.done:
+            loop = QtCore.QEventLoop()
+            task.add_done_callback(lambda _: loop.quit())
+            loop.exec_()
+
+        if task.state == Task.FAILED:
+            raise task.error
+        if task.state == Task.CANCELLED:
+            raise TaskCancelled("Task '%s' was cancelled." % task.name)
+        return task.result
+
+    def _run_slice(self):
+        """
+        Runs steps of the pending tasks until the time budget is spent.
+        """
+        deadline = time.perf_counter() + self._time_budget
+
+        while self._tasks and time.perf_counter() < deadline:
+            # forget about the tasks cancelled in the meantime
+            self._tasks = [entry for entry in self._tasks if not entry[2].done]
+            if not self._tasks:
+                break
+
+            # take turns among the tasks with the highest priority
+            (priority, _, task) = self._tasks.pop(0)
+            task.step()
+            if not task.done:
+                self._tasks.append((priority, next(self._counter), task))
+                self._tasks.sort(key=lambda x: x[:2])
+
+        if not self._tasks:
+            self._timer.stop()
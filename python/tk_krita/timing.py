@@ -0,0 +1,218 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Timing of the different phases of the engine startup.
+
+Note that this module is also loaded by the Krita extension and the startup
+code before the engine exists, so it should only depend on the standard
+library and krita. The recorder is kept in the krita module so all of them
+share the same one.
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+import krita
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+class SpanRecorder(object):
+    """
+    Records named spans of time using a monotonic clock.
+
+    Spans can be nested, in which case the depth of the span is recorded so
+    the report can be read as a tree. Every thread has its own depth, so the
+    spans of the worker threads do not alter the ones of the main thread.
+    Once the recorder is closed, new spans are ignored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = []
+        self._local = threading.local()
+        self._closed = False
+        self.origin = time.perf_counter()
+        self.wall_clock_origin = time.time()
+
+    def _get_depth(self):
+        return getattr(self._local, "depth", 0)
+
+    def _set_depth(self, depth):
+        self._local.depth = depth
+
+    @property
+    def closed(self):
+        """
+        Returns True if the recorder does not accept new spans anymore.
+        """
+        return self._closed
+
+    def begin(self, name, detached=False, **metadata):
+        """
+        Starts a span. Useful for spans that do not fit in a with statement,
+        ie. when they end in a different callback.
+
+        :param detached: If True, the span does not nest the spans started
+                         after it. Use it for spans that end in a different
+                         callback, so they do not alter the depth of the spans
+                         recorded in the meantime.
+
+        :returns: The span, to be passed to :meth:`end`, or None if the
+                  recorder is closed.
+        """
+        with self._lock:
+            if self._closed:
+                return None
+
+            span = {
+                "name": name,
+                "start": time.perf_counter(),
+                "end": None,
+                "depth": self._get_depth(),
+                "thread": threading.current_thread().name,
+                "detached": detached,
+            }
+            if metadata:
+                span["metadata"] = metadata
+
+            self._spans.append(span)
+            if not detached:
+                self._set_depth(self._get_depth() + 1)
+            return span
+
+    def end(self, span):
+        """
+        Ends a span started with :meth:`begin`.
+        """
+        if span is None:
+            return
+
+        with self._lock:
+            if span["end"] is None:
+                span["end"] = time.perf_counter()
+                if not span["detached"]:
+                    self._set_depth(max(0, self._get_depth() - 1))
+
+    @contextlib.contextmanager
+    def span(self, name, **metadata):
+        """
+        Records the time spent in the with statement.
+        """
+        span = self.begin(name, **metadata)
+        try:
+            yield span
+        finally:
+            self.end(span)
+
+    def record(self, name, start, end, **metadata):
+        """
+        Records a span measured by other means, ie. with time.perf_counter()
+        """
+        with self._lock:
+            if self._closed:
+                return
+
+            span = {
+                "name": name,
+                "start": start,
+                "end": end,
+                "depth": self._get_depth(),
+                "thread": threading.current_thread().name,
+                "detached": True,
+            }
+            if metadata:
+                span["metadata"] = metadata
+            self._spans.append(span)
+
+    def report(self, **extra):
+        """
+        Returns a dictionary with all the spans recorded so far, where times
+        are in milliseconds relative to the creation of the recorder.
+        Spans that have not ended yet are reported with a None duration.
+        """
+        now = time.perf_counter()
+
+        with self._lock:
+            spans = []
+            for span in sorted(self._spans, key=lambda x: x["start"]):
+                entry = {
+                    "name": span["name"],
+                    "depth": span["depth"],
+                    "thread": span["thread"],
+                    "start_ms": round((span["start"] - self.origin) * 1000.0, 3),
+                    "duration_ms": None,
+                }
+                if span["end"] is not None:
+                    entry["duration_ms"] = round((span["end"] - span["start"]) * 1000.0, 3)
+                if "metadata" in span:
+                    entry["metadata"] = span["metadata"]
+                spans.append(entry)
+
+        report = {
+            "started": time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(self.wall_clock_origin)
+            ),
+            "total_ms": round((now - self.origin) * 1000.0, 3),
+            "spans": spans,
+        }
+        report.update(extra)
+        return report
+
+    def write_report(self, folder, prefix="tk-krita_startup", **extra):
+        """
+        Writes the report as a json file in the given folder and closes the
+        recorder.
+
+        :returns: The path of the report.
+        """
+        report = self.report(**extra)
+        with self._lock:
+            self._closed = True
+
+        file_name = "%s_%s_%s.json" % (
+            prefix,
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(self.wall_clock_origin)),
+            os.getpid(),
+        )
+        report_path = os.path.join(folder, file_name)
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=4)
+
+        return report_path
+
+
+def get_startup_recorder():
+    """
+    Returns the recorder of the current Krita launch, creating it if needed.
+    """
+    # this is a place to put our persistent variables between different
+    # documents opened
+    if not hasattr(krita, "shotgun"):
+        krita.shotgun = lambda: None
+
+    recorder = getattr(krita.shotgun, "startup_recorder", None)
+    if recorder is None:
+        recorder = SpanRecorder()
+        krita.shotgun.startup_recorder = recorder
+
+    return recorder
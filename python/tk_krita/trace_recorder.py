@@ -0,0 +1,188 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Trace of what the engine and the hooks do, and in which thread, in the Chrome
+Trace Event format, so it can be opened in https://ui.perfetto.dev or
+chrome://tracing.
+
+The recorder is kept in the krita module, like the startup recorder, so the
+trace goes on across the restarts of the engine when the context changes.
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+import collections
+
+import krita
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+# maximum number of events kept, the oldest ones are dropped after that.
+# An event takes a few hundred bytes.
+DEFAULT_MAX_EVENTS = 100000
+
+
+def _get_thread_id():
+    # native ids are small numbers, python ones do not fit in a javascript
+    # number. get_native_id is only available from python 3.8
+    if hasattr(threading, "get_native_id"):
+        return threading.get_native_id()
+    return threading.get_ident()
+
+
+class TraceRecorder(object):
+    """
+    Records spans of time as Chrome Trace Event complete events, in a buffer
+    of limited size so it can be left on.
+
+    Spans are only recorded once they end, so dropping the oldest events never
+    leaves a span without its end.
+    """
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS, enabled=False):
+        self._events = collections.deque(maxlen=max_events)
+        self._thread_names = {}
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+        self.enabled = enabled
+
+    def _timestamp(self, value):
+        # microseconds since the recorder was created
+        return round((value - self._origin) * 1e6, 3)
+
+    def record(self, name, start, end, category="engine", args=None):
+        """
+        Records a span measured by other means, ie. with time.perf_counter()
+        """
+        if not self.enabled:
+            return
+
+        thread_id = _get_thread_id()
+        if thread_id not in self._thread_names:
+            self._thread_names[thread_id] = threading.current_thread().name
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._timestamp(start),
+            "dur": self._timestamp(end) - self._timestamp(start),
+            "pid": self._pid,
+            "tid": thread_id,
+        }
+        if args:
+            event["args"] = args
+        self._events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, category="engine", **args):
+        """
+        Records the time spent in the with statement.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), category, args)
+
+    def instant(self, name, category="engine", **args):
+        """
+        Records something that happened at a given moment, ie. a signal.
+        """
+        if not self.enabled:
+            return
+
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": self._timestamp(time.perf_counter()),
+            "pid": self._pid,
+            "tid": _get_thread_id(),
+        }
+        if args:
+            event["args"] = args
+        self._events.append(event)
+
+    def clear(self):
+        """
+        Drops all the recorded events.
+        """
+        self._events.clear()
+
+    def trace(self):
+        """
+        Returns the recorded events as a Chrome trace dictionary.
+        """
+        events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": thread_id,
+                "args": {"name": thread_name},
+            }
+            for (thread_id, thread_name) in list(self._thread_names.items())
+        ]
+        events.append(
+            {"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": "Krita"}}
+        )
+        events.extend(list(self._events))
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, folder, prefix="tk-krita_trace"):
+        """
+        Writes the trace as a json file in the given folder.
+
+        :returns: The path of the trace.
+        """
+        file_name = "%s_%s_%s.json" % (prefix, time.strftime("%Y%m%d-%H%M%S"), self._pid)
+        trace_path = os.path.join(folder, file_name)
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        with open(trace_path, "w") as trace_file:
+            json.dump(self.trace(), trace_file)
+
+        return trace_path
+
+
+def get_trace_recorder(max_events=DEFAULT_MAX_EVENTS, enabled=False):
+    """
+    Returns the trace recorder of the Krita session, creating it if needed.
+    The arguments are only used when it is created.
+    """
+    # this is a place to put our persistent variables between different
+    # documents opened
+    if not hasattr(krita, "shotgun"):
+        krita.shotgun = lambda: None
+
+    recorder = getattr(krita.shotgun, "trace_recorder", None)
+    if recorder is None:
+        recorder = TraceRecorder(max_events, enabled)
+        krita.shotgun.trace_recorder = recorder
+
+    return recorder
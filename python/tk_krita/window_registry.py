@@ -0,0 +1,185 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2019-2020, Diego Garcia Huerta.
+#
+# Your use of this software as distributed in this GitHub repository, is
+# governed by the BSD 3-clause License.
+#
+# Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
+# agreement between you and Autodesk / Shotgun.
+#
+# The full license is in the file LICENSE, distributed with this software.
+# ----------------------------------------------------------------------------
+
+"""
+Registry of the Krita main windows and the widgets the engine needs from
+them.
+
+"""
+
+import functools
+
+import krita
+
+from tank.platform.qt import QtGui, QtCore
+
+from . import document_events
+
+
+__author__ = "Diego Garcia Huerta"
+__contact__ = "https://www.linkedin.com/in/diegogh/"
+
+
+class WindowRegistry(QtCore.QObject):
+    """
+    Keeps track of the Krita main windows as they are created and closed, so
+    the main window, its menu bar and the dock widgets docked into it can be
+    retrieved without going through all the widgets of the application.
+    """
+
+    def __init__(self, event_bus, parent=None):
+        """
+        :param event_bus: DocumentEventBus telling us when windows are
+                          created or closed.
+        """
+        super(WindowRegistry, self).__init__(parent)
+
+        self._event_bus = event_bus
+
+        # Krita Window wrappers of the windows we know about
+        self._windows = []
+        self._main_window = None
+        self._menubar = None
+        self._dock_widgets = {}
+        self._started = False
+
+    def start(self):
+        """
+        Start listening to the windows being created and closed.
+        """
+        if self._started:
+            return
+
+        self._started = True
+
+        self._event_bus.subscribe(document_events.WINDOW_CREATED, self.refresh)
+        self._event_bus.subscribe(document_events.WINDOW_CLOSED, self.refresh)
+
+        self.refresh()
+
+    def stop(self):
+        """
+        Stop listening to the windows.
+        """
+        if not self._started:
+            return
+
+        self._started = False
+
+        self._event_bus.unsubscribe(document_events.WINDOW_CREATED, self.refresh)
+        self._event_bus.unsubscribe(document_events.WINDOW_CLOSED, self.refresh)
+
+        self._windows = []
+        self.invalidate()
+
+    def refresh(self):
+        """
+        Forgets about the closed windows and starts tracking the new ones.
+        """
+        windows = krita.Krita.instance().windows()
+        qwindows = [window.qwindow() for window in windows]
+
+        self._windows = [window for window in self._windows if window.qwindow() in qwindows]
+        known_qwindows = [window.qwindow() for window in self._windows]
+
+        for window in windows:
+            if window.qwindow() not in known_qwindows:
+                window.qwindow().destroyed.connect(self.invalidate)
+                self._windows.append(window)
+
+        if self._main_window is not None and self._main_window not in qwindows:
+            self.invalidate()
+
+    def invalidate(self, *_):
+        """
+        Forgets the cached widgets, they are looked up again when needed.
+        """
+        self._main_window = None
+        self._menubar = None
+        self._dock_widgets = {}
+
+    @property
+    def main_window(self):
+        """
+        Returns the Krita main window or None if there is none yet.
+        """
+        if not self._started:
+            # nobody tells us when the windows change, so nothing is cached
+            windows = krita.Krita.instance().windows()
+            return windows[0].qwindow() if windows else None
+
+        if self._main_window is None and self._windows:
+            self._main_window = self._windows[0].qwindow()
+
+        return self._main_window
+
+    @property
+    def menubar(self):
+        """
+        Returns the menu bar of the main window or None if it does not have
+        one yet.
+        """
+        if self._menubar is None:
+            main_window = self.main_window
+            if main_window is not None:
+                # note that menuBar() would create a menu bar if there was
+                # none yet
+                menubar = main_window.menuWidget()
+                if isinstance(menubar, QtGui.QMenuBar):
+                    self._menubar = menubar
+
+        return self._menubar
+
+    def dock_widget(self, object_name):
+        """
+        Returns the dock widget with the given object name docked into the
+        main window, or None if there is no such dock widget.
+        """
+        dock_widget = self._dock_widgets.get(object_name)
+        if dock_widget is not None:
+            return dock_widget
+
+        main_window = self.main_window
+        if main_window is None:
+            return None
+
+        # dock widgets are direct children of the main window, no need to go
+        # through the whole widget tree
+        dock_widget = main_window.findChild(
+            QtGui.QDockWidget, object_name, QtCore.Qt.FindDirectChildrenOnly
+        )
+        if dock_widget is not None:
+            self.add_dock_widget(dock_widget)
+        return dock_widget
+
+    def add_dock_widget(self, dock_widget):
+        """
+        Registers a dock widget docked into the main window.
+        """
+        object_name = dock_widget.objectName()
+        self._dock_widgets[object_name] = dock_widget
+        dock_widget.destroyed.connect(
+            functools.partial(self._on_dock_widget_destroyed, object_name, dock_widget)
+        )
+
+    def remove_dock_widget(self, dock_widget):
+        """
+        Forgets about a dock widget.
+        """
+        for (name, known_dock_widget) in list(self._dock_widgets.items()):
+            if known_dock_widget is dock_widget:
+                del self._dock_widgets[name]
+
+    def _on_dock_widget_destroyed(self, object_name, dock_widget, *_):
+        # another dock widget could have been registered with the same name
+        if self._dock_widgets.get(object_name) is dock_widget:
+            del self._dock_widgets[object_name]
@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -11,8 +11,8 @@
 # ----------------------------------------------------------------------------
 
 import os
-import imp
 import sys
+import importlib.util
 
 from krita import Extension, qWarning
 
@@ -28,6 +28,37 @@ if SGTK_MODULE_PATH and SGTK_MODULE_PATH not in sys.path:
     sys.path.insert(0, SGTK_MODULE_PATH)
 
 
+def _load_source(module_name, module_path):
+    """
+    Loads the python module at the given path, the way the deprecated
+    imp.load_source did.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_startup_recorder():
+    """
+    Returns the recorder used to time the startup phases of this Krita launch,
+    shared with the engine, or None if it is not available, ie. the engine
+    installed is older than this extension.
+    """
+    engine_startup_path = os.environ.get("SGTK_KRITA_ENGINE_STARTUP")
+    if not engine_startup_path:
+        return None
+
+    engine_root = os.path.dirname(os.path.dirname(engine_startup_path))
+    timing_path = os.path.join(engine_root, "python", "tk_krita", "timing.py")
+    if not os.path.exists(timing_path):
+        return None
+
+    timing = _load_source("sgtk_krita_timing", timing_path)
+    return timing.get_startup_recorder()
+
+
 class ShotgunBridge(Extension):
     """
     Basic Krita extension to trigger the toolkit startup once Krita has
@@ -43,7 +74,13 @@ class ShotgunBridge(Extension):
     def createActions(self, window):
         # only bootstrap if we are in a shotgun environment
         if SGTK_MODULE_PATH:
-            self.bootstrap()
+            recorder = get_startup_recorder()
+            span = recorder.begin("ShotgunBridge.createActions") if recorder else None
+            try:
+                self.bootstrap()
+            finally:
+                if recorder:
+                    recorder.end(span)
         else:
             qWarning(
                 "Krita was not run within a Shotgun Environment. "
@@ -52,7 +89,7 @@ class ShotgunBridge(Extension):
 
     def bootstrap(self):
         engine_startup_path = os.environ.get("SGTK_KRITA_ENGINE_STARTUP")
-        engine_startup = imp.load_source("sgtk_krita_engine_startup", engine_startup_path)
+        engine_startup = _load_source("sgtk_krita_engine_startup", engine_startup_path)
 
         # Fire up Toolkit and the environment engine when there's time.
         engine_startup.start_toolkit()
@@ -1,7 +1,7 @@
 # ----------------------------------------------------------------------------
 # Copyright (c) 2019-2020, Diego Garcia Huerta.
 #
-# Your use of this software as distributed in this GitHub repository, is 
+# Your use of this software as distributed in this GitHub repository, is
 # governed by the BSD 3-clause License.
 #
 # Your use of the Shotgun Pipeline Toolkit is governed by the applicable license
@@ -17,6 +17,7 @@ It sets up the Toolkit context and prepares the engine.
 
 import os
 import sys
+import importlib.util
 import traceback
 
 __author__ = "Diego Garcia Huerta"
@@ -25,11 +26,30 @@ __contact__ = "https://www.linkedin.com/in/diegogh/"
 
 ENGINE_NAME = "tk-krita"
 
+# environment variable that starts the engine without any UI, see the engine
+HEADLESS_ENV = "SGTK_KRITA_HEADLESS"
+
+# environment variable that starts the engine in the context it started in the
+# last time Krita was launched the same way, see get_context_from_snapshot
+CACHED_BOOTSTRAP_ENV = "SGTK_KRITA_CACHED_BOOTSTRAP"
+
 import sgtk
 
 logger = sgtk.LogManager.get_logger(__name__)
 
 
+def _load_source(module_name, module_path):
+    """
+    Loads the python module at the given path, the way the deprecated
+    imp.load_source did.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
 def display_error(msg):
     print("Shotgun Error | %s | %s " % (ENGINE_NAME, msg))
 
@@ -42,10 +62,107 @@ def display_info(msg):
     print("Shotgun Info | %s | %s " % (ENGINE_NAME, msg))
 
 
+def is_headless():
+    """
+    Returns True if Toolkit is started without any UI, ie. from kritarunner.
+    """
+    return os.environ.get(HEADLESS_ENV, "0") not in ("", "0")
+
+
+def is_cached_bootstrap():
+    """
+    Returns True if the engine should start from the snapshot of the context
+    it started in the last time, see get_context_from_snapshot.
+    """
+    return os.environ.get(CACHED_BOOTSTRAP_ENV, "0") not in ("", "0")
+
+
+def load_engine_module(module_name):
+    """
+    Loads one of the engine python modules directly from its location, as
+    they are not available until the engine starts.
+    """
+    engine_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    module_path = os.path.join(engine_root, "python", "tk_krita", "%s.py" % module_name)
+    return _load_source("sgtk_krita_%s" % module_name, module_path)
+
+
+def get_startup_recorder():
+    """
+    Returns the recorder used to time the startup phases of this Krita
+    launch, shared with the Krita extension and the engine.
+    """
+    return load_engine_module("timing").get_startup_recorder()
+
+
+def get_context_from_store(file_path, context):
+    """
+    Returns the context stored by previous sessions for the file we are about
+    to open, so the engine can start directly in it instead of resolving it
+    again once the file is opened. Returns None if there is no valid
+    stored context for the file.
+    """
+    try:
+        context_store = load_engine_module("context_store")
+        store = context_store.ContextStore()
+        stored_context = store.get_context(file_path)
+    except Exception as e:
+        logger.debug("Could not read the stored context for '%s': %s" % (file_path, e))
+        return None
+
+    if stored_context:
+        logger.debug(
+            "Using the stored context %s for the file '%s'" % (stored_context, file_path)
+        )
+
+    return stored_context
+
+
+def get_context_from_snapshot(engine_name, context, file_to_open):
+    """
+    Returns the context the engine started in the last time Krita was
+    launched with the same context and file to open, or None if there is no
+    valid snapshot of it. Either way, the engine takes a new snapshot in the
+    background once Krita is up, and changes context if the one it started
+    in turns out to be out of date.
+    """
+    import krita
+
+    try:
+        bootstrap_snapshot = load_engine_module("bootstrap_snapshot")
+        context_store = load_engine_module("context_store")
+
+        key = bootstrap_snapshot.get_launch_key(engine_name, context, file_to_open)
+        snapshot = bootstrap_snapshot.BootstrapSnapshot(key)
+        snapshot_context = snapshot.get_context(
+            context_store.get_config_fingerprint(context.sgtk)
+        )
+    except Exception as e:
+        logger.debug("Could not read the bootstrap snapshot: %s" % e)
+        return None
+
+    # this is a place to put our persistent variables between different
+    # documents opened
+    if not hasattr(krita, "shotgun"):
+        krita.shotgun = lambda: None
+
+    # see KritaEngine._refresh_bootstrap_snapshot
+    krita.shotgun.bootstrap_snapshot = {
+        "key": key,
+        "file_to_open": file_to_open,
+        "from_snapshot": snapshot_context is not None,
+    }
+
+    if snapshot_context:
+        logger.debug("Starting from the bootstrap snapshot %s" % snapshot.path)
+
+    return snapshot_context
+
+
 def start_toolkit_classic():
     """
     Parse enviornment variables for an engine name and
-    serialized Context to use to startup Toolkit, 
+    serialized Context to use to startup Toolkit,
     the engine and environment.
     """
 
@@ -77,12 +194,26 @@ def start_toolkit_classic():
         display_error(msg)
         return
 
+    # If a file is going to be opened, start directly in its context if it
+    # was resolved by a previous session.
+    file_to_open = os.environ.get("SGTK_FILE_TO_OPEN")
+    snapshot_context = None
+    if is_cached_bootstrap():
+        with get_startup_recorder().span("get_context_from_snapshot"):
+            snapshot_context = get_context_from_snapshot(env_engine, context, file_to_open)
+
+    if snapshot_context:
+        context = snapshot_context
+    elif file_to_open:
+        context = get_context_from_store(file_to_open, context) or context
+
     try:
         # Start up the toolkit engine from the environment data
         logger.debug(
             "Launching engine instance '%s' for context %s" % (env_engine, env_context)
         )
-        engine = sgtk.platform.start_engine(env_engine, context.sgtk, context)
+        with get_startup_recorder().span("sgtk.platform.start_engine"):
+            engine = sgtk.platform.start_engine(env_engine, context.sgtk, context)
     except Exception as e:
         msg = "Shotgun: Could not start engine. Details: %s" % e
         etype, value, tb = sys.exc_info()
@@ -105,27 +236,48 @@ def start_toolkit():
         display_error(msg)
         return
 
-    # start up toolkit logging to file
-    sgtk.LogManager().initialize_base_file_handler(ENGINE_NAME)
+    recorder = get_startup_recorder()
 
-    # Rely on the classic boostrapping method
-    start_toolkit_classic()
+    with recorder.span("start_toolkit"):
+        # start up toolkit logging to file
+        sgtk.LogManager().initialize_base_file_handler(ENGINE_NAME)
 
-    # Check if a file was specified to open and open it.
-    file_to_open = os.environ.get("SGTK_FILE_TO_OPEN")
-    if file_to_open:
-        msg = "Shotgun: Opening '%s'..." % file_to_open
-        display_info(msg)
+        # Rely on the classic boostrapping method
+        with recorder.span("start_toolkit_classic"):
+            start_toolkit_classic()
 
-        from krita import Krita
+        # Check if a file was specified to open and open it.
+        file_to_open = os.environ.get("SGTK_FILE_TO_OPEN")
+        if file_to_open:
+            msg = "Shotgun: Opening '%s'..." % file_to_open
+            display_info(msg)
 
-        krita_app = Krita.instance()
-        doc = krita_app.openDocument(file_to_open)
-        krita_app.activeWindow().addView(doc)
-        doc.waitForDone()
+            from krita import Krita
+
+            with recorder.span("open file to open"):
+                krita_app = Krita.instance()
+                doc = krita_app.openDocument(file_to_open)
+                # there are no windows to show it in when running headless,
+                # the hooks use the last opened document instead.
+                if not is_headless():
+                    krita_app.activeWindow().addView(doc)
+                doc.waitForDone()
 
     # Clean up temp env variables.
     del_vars = ["SGTK_ENGINE", "SGTK_CONTEXT", "SGTK_FILE_TO_OPEN"]
     for var in del_vars:
         if var in os.environ:
             del os.environ[var]
+
+
+def start_toolkit_headless():
+    """
+    Starts Toolkit and the engine without any UI, ie. from a kritarunner
+    script in a render farm, so the publish hooks can run unattended.
+    The same environment variables as for a regular launch are needed,
+    see startup.py
+    """
+    os.environ[HEADLESS_ENV] = "1"
+    start_toolkit()
+
+    return sgtk.platform.current_engine()